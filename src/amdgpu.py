@@ -0,0 +1,138 @@
+"""AMD GPU metrics.
+
+AmdGpuBackend reads the amdgpu driver files of every AMD card through the persistent
+files of the sysfs module: gpu_busy_percent, pp_dpm_sclk (the current level is marked
+with a *), and temp1_input (edge) and power1_average (power1_input on recent kernels)
+of its hwmon directory. PyAmdGpuInfoBackend reads the GPUs detected by pyamdgpuinfo,
+which is only imported when the backend is first sampled.
+
+Both read every GPU in one pass and give gpu_<metric> for the first GPU,
+gpu<N>_<metric> and gpu_max_<metric>.
+"""
+import glob
+import os
+import re
+
+from sampler import GpuBackend, get_indexed_values
+from sysfs import SysfsFile
+
+
+DRM_PATH = "/sys/class/drm"
+SCLK_PATTERN = re.compile(rb"(\d+)\s*Mhz\s*\*", re.IGNORECASE)
+
+
+def find_file(paths):
+    """A SysfsFile of the first existing path, None if there is none."""
+    for path in paths:
+        if os.path.exists(path):
+            return SysfsFile(path)
+    return None
+
+
+class AmdGpuCard:
+    def __init__(self, device_path):
+        self.device_path = device_path
+        hwmon_paths = sorted(glob.glob(os.path.join(device_path, "hwmon", "hwmon*")))
+        self.busy_file = find_file([os.path.join(device_path, "gpu_busy_percent")])
+        self.sclk_file = find_file([os.path.join(device_path, "pp_dpm_sclk")])
+        self.temp_file = find_file([os.path.join(path, "temp1_input") for path in hwmon_paths])
+        self.power_file = find_file([os.path.join(path, name) for path in hwmon_paths
+                                     for name in ("power1_average", "power1_input")])
+
+    def read_temp(self):
+        return self.temp_file.read_int() / 1000
+
+    def read_usage(self):
+        return self.busy_file.read_int()
+
+    def read_frequency(self):
+        """MHz of the current sclk level."""
+        match = SCLK_PATTERN.search(self.sclk_file.read_bytes())
+        return int(match.group(1)) if match else None
+
+    def read_power(self):
+        return self.power_file.read_int() / 1000000
+
+    def read(self):
+        values = {}
+        for metric, sysfs_file, read in (
+            ('temp', self.temp_file, self.read_temp),
+            ('usage', self.busy_file, self.read_usage),
+            ('frequency', self.sclk_file, self.read_frequency),
+            ('power', self.power_file, self.read_power),
+        ):
+            if sysfs_file is None:
+                continue
+            try:
+                values[metric] = read()
+            except (OSError, ValueError):
+                values[metric] = None
+        return values
+
+    def close(self):
+        for sysfs_file in (self.busy_file, self.sclk_file, self.temp_file, self.power_file):
+            if sysfs_file is not None:
+                sysfs_file.close()
+
+
+def find_cards(base_path=DRM_PATH):
+    """AmdGpuCard of every card driven by amdgpu, in the card order."""
+    cards = {}
+    for path in glob.glob(os.path.join(base_path, "card[0-9]*")):
+        match = re.fullmatch(r"card(\d+)", os.path.basename(path))  # not the connectors, e.g. card0-DP-1
+        device_path = os.path.join(path, "device")
+        if match and os.path.basename(os.path.realpath(os.path.join(device_path, "driver"))) == "amdgpu":
+            cards[int(match.group(1))] = AmdGpuCard(device_path)
+    return [cards[number] for number in sorted(cards)]
+
+
+class AmdGpuBackend(GpuBackend):
+    name = "amdgpu"
+
+    def __init__(self, base_path=DRM_PATH):
+        self.cards = find_cards(base_path)
+
+    def sample(self):
+        return get_indexed_values("gpu", {index: card.read() for index, card in enumerate(self.cards)})
+
+    def close(self):
+        for card in self.cards:
+            card.close()  # reopened by the next sample
+
+
+def query_first(gpu, methods, scale=1):
+    """Call the first of the given query methods that the pyamdgpuinfo version provides."""
+    for method in methods:
+        if hasattr(gpu, method):
+            try:
+                return getattr(gpu, method)() / scale
+            except Exception:
+                continue
+    return None
+
+
+class PyAmdGpuInfoBackend(GpuBackend):
+    name = "pyamdgpuinfo"
+
+    def __init__(self):
+        self.gpus = None
+
+    def open(self):
+        import pyamdgpuinfo
+        self.gpus = [pyamdgpuinfo.get_gpu(index) for index in range(pyamdgpuinfo.detect_gpus())]
+
+    def close(self):
+        self.gpus = None
+
+    def read_gpu(self, gpu):
+        return {
+            'temp': query_first(gpu, ('query_temperature',)),
+            'usage': query_first(gpu, ('query_load',), 0.01),
+            'frequency': query_first(gpu, ('query_sclk', 'query_mclk', 'query_clock'), 10**6),
+            'power': query_first(gpu, ('query_power', 'query_power_draw', 'query_power_watt')),
+        }
+
+    def sample(self):
+        if self.gpus is None:
+            self.open()
+        return get_indexed_values("gpu", {index: self.read_gpu(gpu) for index, gpu in enumerate(self.gpus)})
@@ -0,0 +1,58 @@
+"""Throughput and utilization of a block device from /sys/class/block/<device>/stat.
+
+Only the stat file of the device is read, through a persistent file (see sysfs),
+instead of /proc/diskstats with every device and partition of the host. The speeds
+(MB/s) and the busy time (percent) are computed from the deltas of the counters
+between two samples, on the time.monotonic() clock.
+"""
+import os
+import re
+import time
+
+from sysfs import SysfsFile
+
+
+BLOCK_PATH = "/sys/class/block"  # disks and partitions, /sys/block only has the disks
+SECTOR_SIZE = 512  # bytes, the unit of the stat file whatever the device sector size
+READ_SECTORS = 2
+WRITE_SECTORS = 6
+IO_TICKS = 9  # milliseconds spent doing I/O
+
+
+def list_devices(pattern, base_path=BLOCK_PATH):
+    """The block devices whose name matches pattern, in natural order (nvme2n1 before nvme10n1)."""
+    try:
+        names = os.listdir(base_path)
+    except OSError:
+        return []
+    return sorted((name for name in names if re.match(pattern, name)),
+                  key=lambda name: [int(n) for n in re.findall(r"\d+", name)])
+
+
+class BlockStat:
+    def __init__(self, device, base_path=BLOCK_PATH):
+        self.device = device
+        self.file = SysfsFile(os.path.join(base_path, device, "stat"))
+        self.last = None  # (time, read sectors, write sectors, io ticks) of the previous sample
+
+    def read(self):
+        fields = self.file.read_bytes().split()
+        return int(fields[READ_SECTORS]), int(fields[WRITE_SECTORS]), int(fields[IO_TICKS])
+
+    def sample(self):
+        """{read_speed, write_speed, usage} since the previous call, None on the first call."""
+        now = time.monotonic()
+        read_sectors, write_sectors, io_ticks = self.read()
+        last, self.last = self.last, (now, read_sectors, write_sectors, io_ticks)
+        if last is None or now <= last[0]:
+            return None
+        elapsed = now - last[0]
+        return {
+            'read_speed': max(0, int((read_sectors - last[1]) * SECTOR_SIZE / (1024**2 * elapsed))),
+            'write_speed': max(0, int((write_sectors - last[2]) * SECTOR_SIZE / (1024**2 * elapsed))),
+            'usage': min(100, max(0, (io_ticks - last[3]) / (elapsed * 10))),
+        }
+
+    def close(self):
+        self.last = None  # the next sample starts over
+        self.file.close()
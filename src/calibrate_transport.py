@@ -0,0 +1,120 @@
+"""Find the smallest delay between two HID reports that a device handles reliably.
+
+Usage:
+    python3 src/calibrate_transport.py "Thermalright HR-10 2280 PRO" --conf conf
+    python3 src/calibrate_transport.py "Pearless Assasin 120" --backend loopback:0.002
+
+Test frames are sent with a decreasing report gap (binary search between --min-gap
+and --max-gap). A gap fails when a write raises or is short, when a stand-in device
+counts dropped reports, or, with --interactive, when you answer that the display did
+not show the test pattern correctly.
+With --backend loopback:<gap>, frames go to a stand-in device that drops reports sent
+faster than the given gap, which is useful to check the tool itself without hardware.
+The result is printed as a "transport" section to paste into the device JSON.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from device_configurations import get_device_config
+from frame_encoder import FrameEncoder
+from hid_writer import HidWriter
+from hid_backends import get_backend
+
+
+SETTLE_TIME = 0.5  # pause before each tested gap, so that a failed test does not affect the next one
+
+
+def test_frames(number_of_leds):
+    """Alternating checkerboard frames, in white and red, so that lost reports are visible."""
+    index = np.arange(number_of_leds)
+    return [
+        ((index + k) % 2, np.array(["ffffff" if k % 4 < 2 else "ff0000"] * number_of_leds))
+        for k in range(4)
+    ]
+
+
+def check_gap(writer, encoder, frames, gap, number_of_frames, interactive):
+    writer.report_gap = gap
+    time.sleep(SETTLE_TIME)
+    dropped = getattr(writer.dev, "reports_dropped", 0)  # counted by the stand-in devices, see hid_backends
+    try:
+        for k in range(number_of_frames):
+            leds, colors = frames[k % len(frames)]
+            encoder.encode(leds, colors)
+            writer.write_frame(bytes(encoder.frame), encoder.report_bounds)
+    except Exception as e:
+        print(f"  gap {gap * 1000:.2f} ms: failed ({e})")
+        return False
+    dropped = getattr(writer.dev, "reports_dropped", 0) - dropped
+    if dropped:
+        print(f"  gap {gap * 1000:.2f} ms: failed ({dropped} reports dropped)")
+        return False
+    if interactive:
+        answer = input(f"  gap {gap * 1000:.2f} ms: did every frame show a clean checkerboard? [y/N] ")
+        return answer.strip().lower().startswith("y")
+    print(f"  gap {gap * 1000:.2f} ms: ok")
+    return True
+
+
+def find_report_gap(writer, encoder, frames, min_gap, max_gap, resolution, number_of_frames, interactive):
+    """Binary search of the smallest working gap, None if even max_gap fails."""
+    if not check_gap(writer, encoder, frames, max_gap, number_of_frames, interactive):
+        return None
+    if check_gap(writer, encoder, frames, min_gap, number_of_frames, interactive):
+        return min_gap
+    low, high = min_gap, max_gap
+    while high - low > resolution:
+        mid = (low + high) / 2
+        if check_gap(writer, encoder, frames, mid, number_of_frames, interactive):
+            high = mid
+        else:
+            low = mid
+    return high
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the delay between HID reports for a device layout.")
+    parser.add_argument("layout", help="layout name, as in config.json 'layout_mode'")
+    parser.add_argument("--conf", default=None, help="directory containing the device JSON files")
+    parser.add_argument("--vendor-id", default="0x0416")
+    parser.add_argument("--product-id", default="0x8001")
+    parser.add_argument("--backend", default="hid", help="device backend, see hid_backends (e.g. loopback:0.002)")
+    parser.add_argument("--min-gap", type=float, default=0.0)
+    parser.add_argument("--max-gap", type=float, default=0.02)
+    parser.add_argument("--resolution", type=float, default=0.0002)
+    parser.add_argument("--frames", type=int, default=20, help="frames sent for each tested gap")
+    parser.add_argument("--margin", type=float, default=0.25, help="safety margin added to the result")
+    parser.add_argument("--interactive", action="store_true", help="ask whether the display looks right")
+    args = parser.parse_args()
+
+    device_conf = get_device_config(args.layout, args.conf)
+    number_of_leds = len(device_conf.leds_indexes.get("all", []))
+    if number_of_leds == 0:
+        print(f"Error: layout {args.layout} has no 'all' LED group.")
+        return 1
+    transport = device_conf.transport
+    encoder = FrameEncoder(number_of_leds, transport.header, transport.minimum_message_length, transport.report_size)
+
+    dev = get_backend(args.backend).open(vendor_id=int(args.vendor_id, 16), product_id=int(args.product_id, 16))
+    writer = HidWriter(dev)
+
+    print(f"Calibrating {args.layout}: {number_of_leds} LEDs, {len(encoder.report_bounds)} reports per frame.")
+    gap = find_report_gap(writer, encoder, test_frames(number_of_leds), args.min_gap, args.max_gap,
+                          args.resolution, args.frames, args.interactive)
+    dev.close()
+    if gap is None:
+        print(f"Error: the device does not work even with a {args.max_gap * 1000:.2f} ms gap.")
+        return 1
+
+    report_gap = round(gap * (1 + args.margin), 4)
+    print(f"Smallest working gap: {gap * 1000:.2f} ms, suggested report_gap with margin: {report_gap * 1000:.2f} ms")
+    section = dict(transport.transport_dict, report_gap=report_gap)
+    print(json.dumps({"transport": section}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+"""Compact binary capture of the frames written to the devices.
+
+A capture file starts with MAGIC, followed by one record per frame:
+
+    float64  time.monotonic() when the frame was written
+    uint16   device id (position of the device in the config)
+    uint16   number of reports n
+    n x uint16  length of each report
+    the reports, back to back
+
+All integers are little endian. Each record is appended with a single write.
+"""
+import os
+import struct
+import threading
+
+
+MAGIC = b"DLCDCAP1"
+RECORD_HEADER = struct.Struct("<dHH")
+
+
+class FrameRecorder:
+    """Append the frames written to the devices to a capture file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        # The writer threads record while the controller may close the recorder: the fd
+        # must not be closed (and its number reused) during a write
+        self.lock = threading.Lock()
+        if os.fstat(self.fd).st_size == 0:
+            os.write(self.fd, MAGIC)
+
+    def record(self, timestamp, device_id, frame, report_bounds):
+        lengths = [end - start for start, end in report_bounds]
+        header = RECORD_HEADER.pack(timestamp, device_id, len(lengths)) + struct.pack(f"<{len(lengths)}H", *lengths)
+        if report_bounds[0][0] == 0 and report_bounds[-1][1] == len(frame):
+            data = frame  # the reports are already back to back
+        else:
+            data = b"".join(frame[start:end] for start, end in report_bounds)
+        with self.lock:
+            if self.fd is not None:
+                os.write(self.fd, header + data)
+
+    def close(self):
+        with self.lock:
+            if self.fd is not None:
+                fd, self.fd = self.fd, None
+                os.close(fd)
+
+
+def read_capture(path):
+    """Yield (timestamp, device_id, reports) for each frame of a capture file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a capture file")
+    offset = len(MAGIC)
+    while offset + RECORD_HEADER.size <= len(data):
+        timestamp, device_id, number_of_reports = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        lengths = struct.unpack_from(f"<{number_of_reports}H", data, offset)
+        offset += 2 * number_of_reports
+        if offset + sum(lengths) > len(data):
+            break  # truncated last record
+        reports = []
+        for length in lengths:
+            reports.append(data[offset:offset + length])
+            offset += length
+        yield timestamp, device_id, reports
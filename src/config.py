@@ -200,6 +200,9 @@ default_config = {
     },
     "update_interval": 0.1,
     "metrics_update_interval": 1.0,
+    "metrics_intervals": {},
+    "keepalive_interval": 1.0,
+    "adaptive_refresh": True,
     "cycle_duration": 5.0,
     "gpu_min_temp": 30.0,
     "gpu_max_temp": 90.0,
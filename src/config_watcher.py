@@ -0,0 +1,139 @@
+import os
+import select
+import struct
+import sys
+import time
+
+
+# inotify constants (see <sys/inotify.h>)
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+POLL_INTERVAL = 1.0  # seconds between two stat() of the files while waiting without inotify
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except Exception:
+        return None
+
+
+class ConfigWatcher:
+    """Tell whether any of a set of configuration files changed since the last check.
+
+    Uses inotify on the parent directories when available (so that files replaced by
+    a rename are also noticed) and falls back to comparing mtime/size/inode otherwise.
+    """
+
+    def __init__(self, paths=(), use_inotify=True):
+        self.paths = []
+        self.signatures = {}
+        self.inotify_fd = None
+        self.watches = {}  # watch descriptor -> directory
+        self.libc = _load_libc() if use_inotify else None
+        if self.libc is not None:
+            fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd >= 0:
+                self.inotify_fd = fd
+            else:
+                print("Warning: inotify not available, falling back to polling the config files.")
+        self.set_paths(paths)
+
+    def set_paths(self, paths):
+        """Replace the watched files. The new files are considered up to date."""
+        paths = [os.path.abspath(str(path)) for path in paths]
+        if paths == self.paths:
+            return
+        self.paths = paths
+        self.signatures = {path: self._signature(path) for path in paths}
+        if self.inotify_fd is not None:
+            self._update_watches()
+
+    def changed(self):
+        """Return True if a watched file changed since the previous call."""
+        if self.inotify_fd is not None:
+            return self._read_events()
+        changed = False
+        for path in self.paths:
+            signature = self._signature(path)
+            if signature != self.signatures.get(path):
+                self.signatures[path] = signature
+                changed = True
+        return changed
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds, returning early if a watched file may have changed.
+
+        The change is not consumed: changed() still reports it afterwards.
+        """
+        if self.inotify_fd is not None:
+            select.select([self.inotify_fd], [], [], max(0, timeout))
+            return
+        end = time.monotonic() + timeout
+        while True:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, POLL_INTERVAL))
+            if any(self._signature(path) != self.signatures.get(path) for path in self.paths):
+                return
+
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+
+    def _update_watches(self):
+        directories = {os.path.dirname(path) for path in self.paths}
+        for wd, directory in list(self.watches.items()):
+            if directory not in directories:
+                self.libc.inotify_rm_watch(self.inotify_fd, wd)
+                del self.watches[wd]
+        for directory in directories - set(self.watches.values()):
+            wd = self.libc.inotify_add_watch(self.inotify_fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                print(f"Warning: cannot watch {directory}, falling back to polling the config files.")
+                self.close()
+                return
+            self.watches[wd] = directory
+
+    def _read_events(self):
+        changed = False
+        while True:
+            try:
+                data = os.read(self.inotify_fd, 4096)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                directory = self.watches.get(wd)
+                if directory is not None and os.path.join(directory, os.fsdecode(name)) in self.signatures:
+                    changed = True
@@ -1,9 +1,15 @@
 import numpy as np
 from metrics import Metrics
 from device_configurations import get_device_config
+from config_watcher import ConfigWatcher
 from utils import interpolate_color, get_random_color
 from displayer import DisplayerFactory
-import hid
+from frame_encoder import FrameEncoder
+from hid_writer import HidWriter
+from scheduler import FixedRateScheduler
+from hid_backends import HidBackend, get_backend
+from capture import FrameRecorder
+from exporter import MetricsExporter
 import time
 import datetime 
 import json
@@ -12,8 +18,6 @@ import sys
 from pathlib import Path
 
 
-MINIMUM_MESSAGE_LENGTH = 504  # Minimum length of the message to send to the device
-
 def _number_to_array(number):
     if number>=10:
         return _number_to_array(int(number/10))+[number%10]
@@ -32,47 +36,83 @@ def get_number_array(temp, array_length=3, fill_value=-1):
                 narray = narray[1:]
         return narray
 
-class Controller:
-    def __init__(self, config_path=None):
-        self.temp_unit = {"cpu": "celsius", "gpu": "celsius"}
-        self.metrics = Metrics()
-        self.VENDOR_ID = 0x0416   
-        self.PRODUCT_ID = 0x8001 
-        self.dev = self.get_device()
-        self.HEADER = 'dadbdcdd000000000000000000000000fc0000ff'
-        # default to PA120 configuration until config is loaded
+DEFAULT_LAYOUT = 'Pearless Assasin 120'
+TIME_SOURCES = ("hours", "minutes", "seconds")
+
+
+class DeviceController:
+    """Drive one LCD device: its layout, display mode, colors and HID link."""
+
+    def __init__(self, metrics, config_path, index=0, backend=None):
+        self.index = index  # Position of the device in the config "devices" list
+        self.metrics = metrics  # Shared by all the devices
+        self.backend = backend or HidBackend()  # Opens the device, see hid_backends
         self.config_path = config_path
-        self.leds_indexes = get_device_config('Pearless Assasin 120', config_path).leds_indexes
-        self.number_of_leds = len(self.leds_indexes['all'])
-        self.leds = np.array([0] * self.number_of_leds)
-        # Configurable config path
-        if config_path is None:
-            self.config_path = os.environ.get('DIGITAL_LCD_CONFIG', os.path.join(os.path.dirname(os.path.dirname(__file__)), Path(__file__).parent.parent / "conf"))
-        else:
-            self.config_path = config_path
-        self.cpt = 0  # For alternate_time cycling
-        self.cycle_duration = 50
+        self.temp_unit = {"cpu": "celsius", "gpu": "celsius"}
+        self.VENDOR_ID = None
+        self.PRODUCT_ID = None
+        self.serial_number = None  # Optional, to tell apart devices with the same ids
+        self.hid_path = None  # Optional, to bind the entry to one HID path
+        self.dev = None
+        self.dev_path = None  # HID path the device was opened with
+        self.writer = None  # Thread writing the frames to self.dev
+        self.recorder = None  # Optional capture.FrameRecorder, shared by all the devices
+        self.config = None
+        self.device_conf = None
+        self.elapsed = 0  # Seconds since the display loop started, for cycling colors and displays
+        self.cycle_duration = 5  # seconds
+        self.update_interval = 0.1
         self.display_mode = None
-        self.colors = np.array(["ffe000"] * self.number_of_leds)  # Will be set in update()
         # Factory to manage displayer creation/reuse
         self.displayer = None
-        self.update()
+        self.encoder = None  # Rebuilt in update() when the number of LEDs or the transport changes
+        self.encoder_key = None
+        self.transport = None
+        self.last_frame = None  # Last frame written to the device, to skip identical frames
+        self.last_frame_time = 0
+        self.keepalive_interval = 1.0
+        self.dynamic_colors = False
+        # What can make the frame change, computed in update() for next_change()
+        self.animated = False
+        self.time_sources = set()
+        self.metric_sources = set()  # metrics shown or used by a color gradient
+        self.alternating = False
 
-    def load_config(self):
+    def get_device(self, path=None):
         try:
-            with open(self.config_path+"/config.json", 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading config: {e}")
-            return None
-
-    def get_device(self):
-        try:
-            return hid.Device(self.VENDOR_ID, self.PRODUCT_ID)
+            return self.backend.open(path, self.VENDOR_ID, self.PRODUCT_ID)
         except Exception as e:
             print(f"Error initializing HID device: {e}")
             return None
 
+    def open_device(self, path=None):
+        """(Re)open the HID device and start a writer thread for it."""
+        self.close_device()
+        self.dev = self.get_device(path)
+        self.dev_path = path
+        self.last_frame = None
+        if self.dev is not None:
+            self.writer = HidWriter(self.dev, recorder=self.recorder, device_id=self.index)
+            self.writer.start()
+
+    def close_device(self):
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer.join(timeout=1)
+            self.writer = None
+        if self.dev is not None:
+            try:
+                self.dev.close()
+            except Exception as e:
+                print(f"Error closing HID device: {e}")
+        self.dev = None
+        self.dev_path = None
+
+    def set_recorder(self, recorder):
+        self.recorder = recorder
+        if self.writer is not None:
+            self.writer.recorder = recorder
+
     def set_leds(self, key, value):
         try:
             self.leds[self.leds_indexes[key]] = value
@@ -80,17 +120,21 @@ class Controller:
             print(f"Warning: Key {key} not found in leds_indexes.")
 
     def send_packets(self):
-        message = "".join([self.colors[i] if self.leds[i] != 0 else "000000" for i in range(self.number_of_leds)])
-        if len(message) < MINIMUM_MESSAGE_LENGTH:
-            message += "FF" * (MINIMUM_MESSAGE_LENGTH - len(message))
-        packet0 = bytes.fromhex(self.HEADER+message[:128-len(self.HEADER)])
-        self.dev.write(packet0)
-        packets = message[128-len(self.HEADER):]
-        number_of_packets = int(np.ceil(len(packets)/128))
-        for i in range(number_of_packets):
-            packet = bytes.fromhex('00'+packets[i*128:(i+1)*128])
-            self.dev.write(packet)
-            time.sleep(self.update_interval/(10+number_of_packets))  # small delay to avoid overwhelming the device
+        reports = self.encoder.encode(self.leds, self.colors)
+        now = time.monotonic()
+        # Skip frames identical to the last one sent, but resend it every keepalive_interval
+        if self.encoder.frame == self.last_frame and now - self.last_frame_time < self.keepalive_interval:
+            return
+        self.last_frame = bytes(self.encoder.frame)
+        self.last_frame_time = now
+        self.writer.report_gap = self.transport.get_report_gap(self.update_interval, len(reports))
+        # Never blocks: the writer thread sends the frame, dropping it if a newer one comes first
+        self.writer.publish(self.last_frame, self.encoder.report_bounds)
+
+    @staticmethod
+    def is_dynamic_color(color):
+        """Whether a color spec has to be re-evaluated at each tick (gradient or random)."""
+        return color.lower() == "random" or "-" in color
 
     def get_config_colors(self, config, key="metrics"):
         conf_colors = config.get(key, {}).get('colors', ["ffe000"] * self.number_of_leds)
@@ -113,14 +157,18 @@ class Controller:
                         factor = current_time.hour / 23
                     else:
                         metric = key
+                        # Derived and indexed sources (e.g. cpu_temp_avg10s, core3_usage) use the range of their metric
+                        limits = Metrics.get_range_metric(metric) or metric
                         if metric not in self.metrics.get_metrics(self.temp_unit):
-                            print(f"Warning: {metric} not found in metrics, using start color.")
+                            # A valid source gets a value once set_active() adds it, e.g. cpu_usage_avg10s
+                            if not Metrics.is_data_source(metric):
+                                print(f"Warning: {metric} not found in metrics, using start color.")
                             factor = 0
-                        if self.metrics_min_value[metric] == self.metrics_max_value[metric]:
+                        elif self.metrics_min_value.get(limits) == self.metrics_max_value.get(limits):
                             print(f"Warning: {metric} min and max values are the same, using start color.")
                             factor = 0
                         else:
-                            factor = (self.metrics.get_metrics(self.temp_unit)[metric]-self.metrics_min_value[metric]) / (self.metrics_max_value[metric]-self.metrics_min_value[metric])
+                            factor = (self.metrics.get_metrics(self.temp_unit)[metric]-self.metrics_min_value[limits]) / (self.metrics_max_value[limits]-self.metrics_min_value[limits])
                             if factor > 1:
                                 factor = 1
                                 print(f"Warning: {metric} value exceeds max value, clamping to 1.")
@@ -130,20 +178,31 @@ class Controller:
                 else:
                     start_color, end_color = split_color
 
-                    factor = 1 - abs((self.cpt%self.cycle_duration)/(self.cycle_duration)-1)
+                    factor = 1 - abs((self.elapsed%self.cycle_duration)/(self.cycle_duration)-1)
                 
                 colors.append(interpolate_color(start_color, end_color, factor))
             else:
                 colors.append(color)
         return np.array(colors)
     
-    def update(self):
-        self.config = self.load_config()
+    def update_colors(self):
+        """Re-evaluate the gradient and random colors without reloading the config."""
+        self.metrics_colors = self.get_config_colors(self.config, key="metrics")
+        self.time_colors = self.get_config_colors(self.config, key="time")
+        self.displayer.metrics_colors = self.metrics_colors
+        self.displayer.time_colors = self.time_colors
+
+    def update(self, config, update_interval):
+        """Apply the configuration of this device (None for the defaults)."""
+        self.config = config
+        self.update_interval = update_interval
         if self.config:
             VENDOR_ID = int(self.config.get('vendor_id', "0x0416"),16)
             PRODUCT_ID = int(self.config.get('product_id', "0x8001"),16)
+            serial_number = self.config.get('serial_number')
+            hid_path = self.config.get('path')
             # Use device_configurations to obtain leds_indexes and supported display modes
-            layout_name = self.config.get('layout_mode', 'Pearless Assasin 120')
+            layout_name = self.config.get('layout_mode', DEFAULT_LAYOUT)
             device_conf = get_device_config(layout_name, self.config_path)
             self.leds_indexes = device_conf.leds_indexes
             self.number_of_leds = len(self.leds_indexes['all'])
@@ -166,9 +225,8 @@ class Controller:
             self.display_mode = self.config.get('display_mode', 'metrics')
             self.metrics_colors = self.get_config_colors(self.config, key="metrics")
             self.time_colors = self.get_config_colors(self.config, key="time")
-            self.update_interval = self.config.get('update_interval', 0.1)
-            self.cycle_duration = int(self.config.get('cycle_duration', 5)/self.update_interval)
-            self.metrics.update_interval = self.config.get('metrics_update_interval', 0.5)
+            self.keepalive_interval = self.config.get('keepalive_interval', 1.0)
+            self.cycle_duration = self.config.get('cycle_duration', 5)
 
             if self.display_mode not in device_conf.display_modes:
                 print(f"Warning: Display mode {self.display_mode} not compatible with {layout_name} layout, switching to a compatible mode.")
@@ -178,28 +236,12 @@ class Controller:
                 elif 'alternate_metrics' in device_conf.display_modes:
                     self.display_mode = 'alternate_metrics'
                 else:
-                    self.display_mode = device_conf.display_modes[0]
-
-            # Use factory to get or reuse appropriate displayer
-            self.displayer = DisplayerFactory.get_displayer(
-                self.leds_indexes,
-                self.number_of_leds,
-                self.metrics,
-                self.metrics_colors,
-                self.time_colors,
-                self.temp_unit,
-                self.metrics_min_value,
-                self.metrics_max_value,
-                self.update_interval,
-                self.cycle_duration,
-                device_config=device_conf,
-            )
-            nvme_disk=self.config.get('nvme_disk', None)
-            if nvme_disk is not None:
-                self.metrics.set_nvme_disk(nvme_disk)
+                    self.display_mode = device_conf.get_mode_names()[0]
         else:
             VENDOR_ID = 0x0416
             PRODUCT_ID = 0x8001
+            serial_number = None
+            hid_path = None
             self.metrics_max_value = {
                 "cpu_temp": 90,
                 "gpu_temp": 90,
@@ -213,55 +255,338 @@ class Controller:
                 "gpu_usage": 0,
             }
             self.display_mode = 'metrics'
-            self.time_colors = np.array(["ffe000"] * self.number_of_leds)
-            self.metrics_colors = np.array(["ff0000"] * self.number_of_leds)
-            self.update_interval = 0.1
-            self.cycle_duration = int(5/self.update_interval)
-            self.metrics.update_interval = 0.5
-            device_conf = get_device_config('Pearless Assasin 120', self.config_path)
+            device_conf = get_device_config(DEFAULT_LAYOUT, self.config_path)
             self.leds_indexes = device_conf.leds_indexes
             self.number_of_leds = len(self.leds_indexes['all'])
-            # Use factory for default displayer as well
-            self.displayer = DisplayerFactory.get_displayer(
-                self.leds_indexes,
-                self.number_of_leds,
-                self.metrics,
-                self.metrics_colors,
-                self.time_colors,
-                self.temp_unit,
-                self.metrics_min_value,
-                self.metrics_max_value,
-                self.update_interval,
-                self.cycle_duration,
-                device_config=device_conf,
-            )
+            self.time_colors = np.array(["ffe000"] * self.number_of_leds)
+            self.metrics_colors = np.array(["ff0000"] * self.number_of_leds)
+            self.keepalive_interval = 1.0
+            self.cycle_duration = 5
+        self.device_conf = device_conf
+        # Use factory to get or reuse appropriate displayer
+        self.displayer = DisplayerFactory.get_displayer(
+            self.leds_indexes,
+            self.number_of_leds,
+            self.metrics,
+            self.metrics_colors,
+            self.time_colors,
+            self.temp_unit,
+            self.metrics_min_value,
+            self.metrics_max_value,
+            self.update_interval,
+            self.cycle_duration,
+            device_config=device_conf,
+            key=self.index,
+        )
+        self.update_refresh_sources()
         # Note: leds_indexes may have been updated above using device_configurations
         self.leds = np.array([0] * self.number_of_leds)
-        if VENDOR_ID != self.VENDOR_ID or PRODUCT_ID != self.PRODUCT_ID:
-            print("Warning: Config VENDOR_ID or PRODUCT_ID changed, reinitializing device.")
+        self.colors = self.metrics_colors
+        self.transport = device_conf.transport
+        if self.encoder_key != (self.number_of_leds, self.transport.key()):
+            self.encoder = FrameEncoder(self.number_of_leds, self.transport.header,
+                                        self.transport.minimum_message_length, self.transport.report_size)
+            self.encoder_key = (self.number_of_leds, self.transport.key())
+        self.last_frame = None
+        if (VENDOR_ID, PRODUCT_ID, serial_number, hid_path) != (self.VENDOR_ID, self.PRODUCT_ID, self.serial_number, self.hid_path):
+            if self.dev is not None:
+                print("Warning: Config VENDOR_ID, PRODUCT_ID or serial number changed, reinitializing device.")
             self.VENDOR_ID = VENDOR_ID
             self.PRODUCT_ID = PRODUCT_ID
-            self.dev = self.get_device()
+            self.serial_number = serial_number
+            self.hid_path = hid_path
+            self.close_device()  # The controller binds it again to a matching HID device
+
+    def get_shown_colors(self):
+        """The color specs the display mode can show.
+
+        Time colors are only drawn on the LEDs of the groups mapped to hours, minutes or
+        seconds, and metrics colors on the other LEDs: an LED time-mapped in every display
+        of the mode never shows its metrics color.
+        """
+        if not self.config:
+            return []
+        time_leds = [
+            {int(led) for group, source in mappings.items() if source in TIME_SOURCES
+             for led in self.leds_indexes.get(group, [])}
+            for mappings in self.device_conf.get_mode_mappings(self.display_mode)
+        ] or [set()]
+        always_time_leds = set.intersection(*time_leds)
+        any_time_leds = set.union(*time_leds)
+        metrics_colors = self.config.get("metrics", {}).get('colors', [])[:self.number_of_leds]
+        time_colors = self.config.get("time", {}).get('colors', [])[:self.number_of_leds]
+        return ([color for led, color in enumerate(metrics_colors) if led not in always_time_leds]
+                + [color for led, color in enumerate(time_colors) if led in any_time_leds])
+
+    def update_refresh_sources(self):
+        """Work out from the colors shown and the display mode what can change the frame."""
+        self.animated = False
+        self.time_sources = set()
+        self.metric_sources = set()
+        color_specs = self.get_shown_colors()
+        self.dynamic_colors = any(self.is_dynamic_color(color) for color in color_specs)
+        for color in color_specs:
+            split_color = color.split("-")
+            if color.lower() == "random" or len(split_color) == 2:
+                self.animated = True
+            elif len(split_color) == 3:
+                if split_color[2] in TIME_SOURCES:
+                    self.time_sources.add(split_color[2])
+                elif Metrics.is_data_source(split_color[2]):
+                    self.metric_sources.add(split_color[2])
+        for mappings in self.device_conf.get_mode_mappings(self.display_mode):
+            for data_source in mappings.values():
+                if data_source in TIME_SOURCES:
+                    self.time_sources.add(data_source)
+                elif Metrics.is_data_source(data_source):
+                    self.metric_sources.add(data_source)
+        display_mode = self.device_conf.get_display_mode(self.display_mode)
+        self.alternating = display_mode is not None and display_mode.type == "alternating"
+
+    def next_change(self, elapsed):
+        """Seconds until the frame can change (or has to be resent), 0 if it may change at every tick."""
+        if self.dev is None:
+            return None
+        if self.animated:
+            return 0
+        now = time.time()
+        delays = [self.keepalive_interval - (time.monotonic() - self.last_frame_time)]
+        if "seconds" in self.time_sources:
+            delays.append(1 - now % 1)
+        if "minutes" in self.time_sources or "hours" in self.time_sources:
+            delays.append(60 - now % 60)
+        if self.metric_sources:
+            delays.append(self.metrics.next_refresh_in())
+        if self.alternating:
+            delays.append(self.cycle_duration - elapsed % self.cycle_duration)
+        return max(0, min(delays))
+
+    def matches(self, device_info):
+        """Whether a hid.enumerate() entry can be bound to this device."""
+        if (device_info.get('vendor_id'), device_info.get('product_id')) != (self.VENDOR_ID, self.PRODUCT_ID):
+            return False
+        if device_info.get('stand_in'):
+            return True
+        if self.serial_number is not None and device_info.get('serial_number') != self.serial_number:
+            return False
+        if self.hid_path is not None and device_info.get('path') != os.fsencode(self.hid_path):
+            return False
+        return True
+
+    def tick(self, elapsed):
+        """Render the current frame and hand it to the writer thread."""
+        if self.writer is not None and not self.writer.is_alive():
+            print("HID writer stopped, reinitializing device.")
+            self.open_device(self.dev_path)
+        if self.dev is None:
+            return
+        self.elapsed = elapsed
+        if self.dynamic_colors:
+            self.update_colors()
+        # Delegate the per-layout display construction to the displayer
+        leds_mask, colors, nb_displays = self.displayer.get_state(self.display_mode, self.elapsed)
+        # ensure arrays are numpy arrays of correct length
+        self.leds = np.array(leds_mask, dtype=int)
+        self.colors = np.array(colors)
+        self.send_packets()
+
+
+class Controller:
+    """Drive every configured device from one loop and one shared metrics sampler.
+
+    config.json describes a single device. It may also hold a "devices" list: each
+    entry overrides the top level settings (vendor_id, product_id, serial_number or
+    path, layout_mode, display_mode, colors...) for one device.
+    """
+
+    RETRY_INTERVAL = 5  # seconds between two attempts to find missing devices
+
+    def __init__(self, config_path=None):
+        self.metrics = Metrics()
+        # Configurable config path
+        if config_path is None:
+            self.config_path = os.environ.get('DIGITAL_LCD_CONFIG', os.path.join(os.path.dirname(os.path.dirname(__file__)), Path(__file__).parent.parent / "conf"))
+        else:
+            self.config_path = config_path
+        self.devices = []
+        self.backend = None
+        self.backend_spec = None
+        self.recorder = None
+        self.capture_file = None
+        self.exporter = None
+        self.exporter_address = None
+        self.update_interval = 0.1
+        self.adaptive_refresh = True
+        self.last_bind_time = 0
+        self.scheduler = None  # Created in update() once the update interval is known
+        # config.json and the device JSONs are only re-parsed when one of them changes
+        self.config_watcher = ConfigWatcher()
+        self.update()
+
+    def load_config(self):
+        try:
+            with open(self.config_path+"/config.json", 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading config: {e}")
+            return None
+
+    @staticmethod
+    def get_device_configs(config):
+        """Split the config in one config per device."""
+        if not config or not config.get('devices'):
+            return [config]
+        base = {key: value for key, value in config.items() if key != 'devices'}
+        return [dict(base, **device) for device in config['devices']]
+
+    def update(self):
+        config = self.load_config()
+        if config:
+            self.update_interval = config.get('update_interval', 0.1)
+            self.adaptive_refresh = config.get('adaptive_refresh', True)
+            self.metrics.set_intervals(config.get('metrics_update_interval', 0.5), config.get('metrics_intervals'))
+            self.metrics.set_effective_frequency(config.get('cpu_effective_frequency', False))
+            nvme_disk = config.get('nvme_disk', None)
+            if nvme_disk is not None:
+                self.metrics.set_nvme_disk(nvme_disk)
+        else:
+            self.update_interval = 0.1
+            self.adaptive_refresh = True
+            self.metrics.set_intervals(0.5)
+            self.metrics.set_effective_frequency(False)
+        self.update_backend(os.environ.get('DIGITAL_LCD_BACKEND') or (config or {}).get('backend', 'hid'))
+        self.update_recorder(os.environ.get('DIGITAL_LCD_CAPTURE') or (config or {}).get('capture_file'))
+        self.update_exporter(os.environ.get('DIGITAL_LCD_EXPORTER') or (config or {}).get('metrics_exporter'))
+        device_configs = self.get_device_configs(config)
+        for device in self.devices[len(device_configs):]:
+            device.close_device()
+        self.devices = self.devices[:len(device_configs)]
+        for index in range(len(self.devices), len(device_configs)):
+            self.devices.append(DeviceController(self.metrics, self.config_path, index, self.backend))
+        for device, device_config in zip(self.devices, device_configs):
+            device.set_recorder(self.recorder)
+            device.update(device_config, self.update_interval)
+        # Only the metrics that are displayed or color something are sampled, and all of them when exported
+        sources = set().union(*(device.metric_sources for device in self.devices))
+        if self.exporter is not None:
+            sources.update(Metrics.METRICS_KEYS)
+        self.metrics.set_active(sources)
+        self.bind_devices()
+
+        if self.scheduler is None:
+            self.scheduler = FixedRateScheduler(self.update_interval)
+        else:
+            self.scheduler.set_interval(self.update_interval)
+        if self.exporter is not None:
+            self.exporter.scheduler = self.scheduler
+        watched_files = [os.path.join(self.config_path, "config.json")]
+        for device in self.devices:
+            if device.device_conf.path is not None and device.device_conf.path not in watched_files:
+                watched_files.append(device.device_conf.path)
+        self.config_watcher.set_paths(watched_files)
+
+    def update_backend(self, spec):
+        """Switch to the backend described by spec (see hid_backends), closing the open devices."""
+        if spec == self.backend_spec:
+            return
+        try:
+            backend = get_backend(spec)
+        except ValueError as e:
+            print(f"Error: {e} Using hid.")
+            backend = HidBackend()
+        print(f"Using {backend.name} backend.")
+        self.backend = backend
+        self.backend_spec = spec
+        for device in self.devices:
+            device.close_device()
+            device.backend = backend
+
+    def update_recorder(self, capture_file):
+        """Record every frame written to capture_file (see capture), None to stop recording."""
+        if capture_file == self.capture_file:
+            return
+        if self.recorder is not None:
+            for device in self.devices:
+                device.set_recorder(None)
+            self.recorder.close()
+            self.recorder = None
+        self.capture_file = capture_file
+        if capture_file:
+            try:
+                self.recorder = FrameRecorder(capture_file)
+                print(f"Recording frames to {capture_file}.")
+            except OSError as e:
+                print(f"Error opening capture file {capture_file}: {e}")
+
+    def update_exporter(self, address):
+        """Serve the metrics on address (see exporter), None to stop serving them."""
+        if address == self.exporter_address:
+            return
+        if self.exporter is not None:
+            self.exporter.close()
+            self.exporter = None
+        self.exporter_address = address
+        if address:
+            try:
+                self.exporter = MetricsExporter(address, self.metrics, self.scheduler)
+                print(f"Serving the metrics on {address}.")
+            except (OSError, ValueError) as e:
+                print(f"Error serving the metrics on {address}: {e}")
+
+    def bind_devices(self):
+        """Open a device, found with the backend enumerate(), for each device that has none."""
+        self.last_bind_time = time.monotonic()
+        unbound = [device for device in self.devices if device.dev is None]
+        if not unbound:
+            return
+        claimed = {device.dev_path for device in self.devices if device.dev is not None}
+        found = {}
+        for device in unbound:
+            ids = (device.VENDOR_ID, device.PRODUCT_ID)
+            if ids not in found:
+                try:
+                    found[ids] = self.backend.enumerate(*ids)
+                except Exception as e:
+                    print(f"Error enumerating HID devices: {e}")
+                    found[ids] = []
+            for device_info in found[ids]:
+                if device_info['path'] not in claimed and device.matches(device_info):
+                    device.open_device(device_info['path'])
+                    if device.dev is not None:
+                        claimed.add(device_info['path'])
+                        break
+            if device.dev is None:
+                print("No device found, with VENDOR_ID: {}, PRODUCT_ID: {}".format(device.VENDOR_ID, device.PRODUCT_ID))
 
     def display(self):
+        probed = False
         while True:
-            self.config = self.load_config()
-            self.update()
-            if self.dev is None:
-                print("No device found, with VENDOR_ID: {}, PRODUCT_ID: {}".format(self.VENDOR_ID, self.PRODUCT_ID))
-                time.sleep(5)
-            else:
-                # Delegate the per-layout display construction to the displayer
-
-                leds_mask, colors, nb_displays = self.displayer.get_state(self.display_mode, self.cpt)
-                # ensure arrays are numpy arrays of correct length
-                self.leds = np.array(leds_mask, dtype=int)
-                self.colors = np.array(colors)
-            
+            elapsed = self.scheduler.elapsed()
+            if self.config_watcher.changed():
+                self.update()
+            elif time.monotonic() - self.last_bind_time > self.RETRY_INTERVAL:
+                self.bind_devices()
+            # One metrics sample per tick, shared by every device
+            self.metrics.refresh()
+            for device in self.devices:
+                device.tick(elapsed)
+            if not probed:
+                # The metrics without a function in the probe cache are probed once the first frame is sent
+                self.metrics.probe_missing()
+                probed = True
+            # Sleeps what is left of the update interval, skipping ticks if the work overran,
+            # and skipping the ticks before the next visible change when nothing is animated
+            self.scheduler.wait(self.next_change(), sleep=self.config_watcher.wait)
 
-                self.cpt = (self.cpt + 1) % (self.cycle_duration*nb_displays)
-                self.send_packets()
-            time.sleep(self.update_interval)
+    def next_change(self):
+        """Seconds until something may need to be drawn, see DeviceController.next_change()."""
+        if not self.adaptive_refresh:
+            return 0
+        elapsed = self.scheduler.elapsed()
+        delays = [delay for delay in (device.next_change(elapsed) for device in self.devices) if delay is not None]
+        if any(device.dev is None for device in self.devices):
+            delays.append(self.last_bind_time + self.RETRY_INTERVAL - time.monotonic())
+        return max(0, min(delays, default=self.RETRY_INTERVAL))
 
 
 
@@ -0,0 +1,133 @@
+"""CPU frequency from the cpufreq policies.
+
+One scaling_cur_freq file is read per cpufreq policy (a policy covers the cores that
+share a clock: one core on most x86 CPUs, a cluster on ARM), kept open with the sysfs
+module, instead of one file per logical CPU (psutil.cpu_freq()) or the whole of
+/proc/cpuinfo.
+
+Sources, in MHz: cpu_frequency (average over the cores), core<N>_frequency (the
+frequency of the policy of core N), core_max_frequency and core_min_frequency.
+
+The effective frequency (set_effective()) is measured instead from the TSC, APERF
+and MPERF counters of the first core of each policy, read with pread() at the MSR
+address from /dev/cpu/<N>/msr (msr kernel module, root). As in turbostat, the TSC
+rate over the last sample (MPERF counts at the same rate) times APERF/MPERF gives
+the average frequency while the core was not idle, boost included.
+"""
+import glob
+import os
+import re
+import struct
+import time
+
+from sampler import BatchedBackend
+from sysfs import SysfsFile
+
+
+CPUFREQ_PATH = "/sys/devices/system/cpu/cpufreq"
+MSR_PATH = "/dev/cpu/{cpu}/msr"
+MSR_TSC = 0x10
+MSR_MPERF = 0xE7
+MSR_APERF = 0xE8
+
+
+class CpuFreqPolicy:
+    def __init__(self, path):
+        self.path = path
+        self.cpu = int(re.search(r"policy(\d+)$", path).group(1))
+        try:
+            with open(os.path.join(path, "affected_cpus")) as f:
+                self.cpus = [int(cpu) for cpu in f.read().split()] or [self.cpu]
+        except (OSError, ValueError):
+            self.cpus = [self.cpu]
+        self.file = SysfsFile(os.path.join(path, "scaling_cur_freq"))
+        self.msr_fd = None
+        self.last_counters = None  # (time, tsc, aperf, mperf) of the previous effective sample
+
+    def read(self):
+        """kHz"""
+        return self.file.read_int()
+
+    def read_msr(self, address):
+        return struct.unpack("<Q", os.pread(self.msr_fd, 8, address))[0]
+
+    def read_effective(self):
+        """kHz since the previous call, None on the first call."""
+        if self.msr_fd is None:
+            self.msr_fd = os.open(MSR_PATH.format(cpu=self.cpu), os.O_RDONLY)
+        now = time.monotonic()
+        tsc = self.read_msr(MSR_TSC)
+        mperf = self.read_msr(MSR_MPERF)
+        aperf = self.read_msr(MSR_APERF)
+        last, self.last_counters = self.last_counters, (now, tsc, aperf, mperf)
+        if last is None or now <= last[0] or tsc <= last[1] or mperf <= last[3]:
+            return None
+        tsc_khz = (tsc - last[1]) / (now - last[0]) / 1000
+        return tsc_khz * (aperf - last[2]) / (mperf - last[3])
+
+    def close(self):
+        self.file.close()
+        if self.msr_fd is not None:
+            os.close(self.msr_fd)
+            self.msr_fd = None
+        self.last_counters = None
+
+
+class CpuFreqBackend(BatchedBackend):
+    name = "cpufreq"
+
+    def __init__(self, base_path=CPUFREQ_PATH):
+        paths = glob.glob(os.path.join(base_path, "policy[0-9]*"))
+        self.policies = sorted((CpuFreqPolicy(path) for path in paths), key=lambda policy: policy.cpu)
+        self.effective = False
+
+    def set_effective(self, effective):
+        """Measure the effective frequency from APERF/MPERF, see the module docstring."""
+        if effective != self.effective:
+            self.effective = effective
+            for policy in self.policies:
+                policy.last_counters = None  # measured from the next sample
+
+    def read_policy(self, policy):
+        if self.effective:
+            try:
+                frequency = policy.read_effective()
+                if frequency is not None:
+                    return frequency
+            except OSError as e:
+                print(f"Warning: could not read the APERF/MPERF counters of CPU {policy.cpu}, "
+                      f"using scaling_cur_freq: {e}")
+                self.effective = False
+                self.close()
+        return policy.read()  # also the first effective sample, which has no delta yet
+
+    def sample(self):
+        frequencies = []
+        for policy in self.policies:
+            try:
+                frequency = self.read_policy(policy)
+            except (OSError, ValueError):
+                continue
+            if frequency is not None:
+                frequencies.append((policy, frequency / 1000))
+        if not frequencies:
+            return {}
+        values = {
+            "cpu_frequency": sum(frequency * len(policy.cpus) for policy, frequency in frequencies)
+            / sum(len(policy.cpus) for policy, frequency in frequencies),
+            "core_max_frequency": max(frequency for policy, frequency in frequencies),
+            "core_min_frequency": min(frequency for policy, frequency in frequencies),
+        }
+        for policy, frequency in frequencies:
+            values.update((f"core{cpu}_frequency", frequency) for cpu in policy.cpus)
+        return values
+
+    def close(self):
+        for policy in self.policies:
+            policy.close()
+
+    def get_cpu_frequency(self):
+        return self.sample().get("cpu_frequency")
+
+    def get_core_max_frequency(self):
+        return self.sample().get("core_max_frequency")
@@ -0,0 +1,118 @@
+"""CPU usage from /proc/stat, in total, per core and per CCD.
+
+/proc/stat is kept open and read in one pread() at each sample and the counters of every "cpu" line
+are parsed into one NumPy array; the usage of all the cores is then computed at once
+from the deltas with the previous sample. Cores sharing a L3 cache (a CCD on AMD
+CPUs, the whole die on most Intel CPUs) are grouped as found in sysfs.
+
+Sources: cpu_usage (all cores), core<N>_usage, core_max_usage (busiest core),
+ccd<K>_usage and ccd_max_usage.
+"""
+import glob
+import os
+import re
+
+import numpy as np
+
+from sampler import BatchedBackend
+from sysfs import SysfsFile
+
+
+PROC_STAT_PATH = "/proc/stat"
+CPU_PATH = "/sys/devices/system/cpu"
+FIELDS = 8  # user nice system idle iowait irq softirq steal, guest time is already in user
+IDLE_FIELDS = [3, 4]  # idle, iowait
+
+
+def parse_cpu_list(text):
+    """Parse a sysfs cpu list such as "0-7,64-71"."""
+    cpus = []
+    for part in text.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def get_l3_groups(cpu_path=CPU_PATH):
+    """Lists of the cores sharing each L3 cache, in the order of their first core."""
+    groups = set()
+    for path in glob.glob(os.path.join(cpu_path, "cpu[0-9]*", "cache", "index3", "shared_cpu_list")):
+        try:
+            with open(path) as f:
+                groups.add(tuple(parse_cpu_list(f.read())))
+        except (OSError, ValueError):
+            continue
+    return sorted(groups)
+
+
+class ProcStatBackend(BatchedBackend):
+    name = "proc_stat"
+
+    def __init__(self, path=PROC_STAT_PATH, cpu_path=CPU_PATH):
+        self.path = path
+        self.stat_file = SysfsFile(path)
+        self.l3_groups = get_l3_groups(cpu_path)
+        self.names = None
+        self.last_counters = None
+        self.core_names = []
+        self.ccd_rows = []
+        try:
+            self.sample()  # first counters, the next sample gives a usage
+        except (OSError, ValueError):
+            pass
+
+    def read(self):
+        """Names and counters (one row per line, the total first) of the cpu lines of /proc/stat."""
+        data = self.stat_file.read_bytes()
+        lines = []
+        for line in data.split(b"\n"):
+            if not line.startswith(b"cpu"):
+                break
+            lines.append(line)
+        names = [line.split(None, 1)[0] for line in lines]
+        counters = np.array(b" ".join(line.split(None, 1)[1] for line in lines).split(), dtype=np.int64)
+        return names, counters.reshape(len(lines), -1)[:, :FIELDS]
+
+    def set_cores(self, names):
+        """Index the rows of the cores and of the CCDs, when the online cores change."""
+        self.names = names
+        rows = {int(re.sub(rb"\D", b"", name)): row for row, name in enumerate(names) if name != b"cpu"}
+        self.core_names = [f"core{core}_usage" for core in rows]
+        self.ccd_rows = [np.array([rows[core] for core in group if core in rows]) for group in self.l3_groups]
+        self.ccd_rows = [group for group in self.ccd_rows if len(group)]
+
+    def sample(self):
+        names, counters = self.read()
+        if names != self.names:
+            self.set_cores(names)
+            self.last_counters = counters
+            return {}
+        delta = counters - self.last_counters
+        self.last_counters = counters
+        total = delta.sum(axis=1)
+        busy = total - delta[:, IDLE_FIELDS].sum(axis=1)
+        usage = np.divide(100.0 * busy, total, out=np.zeros(len(total)), where=total > 0)
+        values = {"cpu_usage": usage[0]}
+        if len(usage) > 1:
+            values["core_max_usage"] = usage[1:].max()
+            values.update(zip(self.core_names, usage[1:]))
+        if self.ccd_rows:
+            ccd_usage = [100.0 * busy[rows].sum() / max(1, total[rows].sum()) for rows in self.ccd_rows]
+            values["ccd_max_usage"] = max(ccd_usage)
+            values.update((f"ccd{index}_usage", value) for index, value in enumerate(ccd_usage))
+        return values
+
+    def close(self):
+        self.stat_file.close()  # reopened by the next sample
+
+    def get_cpu_usage(self):
+        return self.sample().get("cpu_usage")
+
+    def get_core_max_usage(self):
+        return self.sample().get("core_max_usage")
+
+    def get_ccd_max_usage(self):
+        return self.sample().get("ccd_max_usage")
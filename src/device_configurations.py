@@ -44,6 +44,31 @@ def _parse_led_range(range_spec, group_name):
 
 
 
+class TransportProfile:
+    """Represents how frames are framed and paced on the HID link of a device."""
+
+    DEFAULT_HEADER = "dadbdcdd000000000000000000000000fc0000ff"
+
+    def __init__(self, transport_dict):
+        self.transport_dict = transport_dict
+        self.header = transport_dict.get("header", self.DEFAULT_HEADER)
+        self.report_size = transport_dict.get("report_size", 64)
+        # Minimum length of the message, in hex characters (see FrameEncoder for the padding)
+        self.minimum_message_length = transport_dict.get("minimum_message_length", 504)
+        # Minimum delay between two reports in seconds, None to derive it from the update interval
+        self.report_gap = transport_dict.get("report_gap")
+
+    def get_report_gap(self, update_interval, number_of_reports):
+        """Get the delay between two reports of a frame."""
+        if self.report_gap is not None:
+            return self.report_gap
+        return update_interval / (10 + number_of_reports)
+
+    def key(self):
+        """Values that require a new frame encoder when they change."""
+        return (self.header, self.report_size, self.minimum_message_length)
+
+
 class DisplayMode:
     """Represents a display mode configuration."""
     
@@ -62,10 +87,12 @@ class DisplayMode:
 class DeviceConfig:
     """Represents a device configuration loaded from JSON."""
     
-    def __init__(self, config_dict):
+    def __init__(self, config_dict, path=None):
         self.config_dict = config_dict
+        self.path = path  # JSON file the configuration was loaded from, if any
         self.leds_indexes, self.digit_count = self._build_leds_indexes()
         self.display_modes = self._build_display_modes()
+        self.transport = TransportProfile(config_dict.get("transport", {}))
     
     def _build_leds_indexes(self):
         """Build the leds_indexes dictionary from the JSON config."""
@@ -107,6 +134,21 @@ class DeviceConfig:
         """Get a display mode by name."""
         return self.display_modes.get(mode_name)
     
+    def get_mode_mappings(self, mode_name):
+        """Get every mappings dict a display mode can show (one per display for alternating modes)."""
+        mode = self.get_display_mode(mode_name)
+        if mode is None:
+            return []
+        if mode.type != "alternating":
+            return [mode.mode_dict.get("mappings", {})]
+        mappings = []
+        for display in mode.displays:
+            if isinstance(display, str):
+                display = self.get_display_mode(display)
+                display = display.mode_dict if display else {}
+            mappings.append(display.get("mappings", {}))
+        return mappings
+
     def get_mode_names(self):
         """Get list of available display mode names."""
         return list(self.display_modes.keys())
@@ -117,7 +159,7 @@ def load_device_config_from_json(json_path):
     try:
         with open(json_path, 'r') as f:
             config_dict = json.load(f)
-        return DeviceConfig(config_dict)
+        return DeviceConfig(config_dict, path=json_path)
     except Exception as e:
         print(f"Error loading config from {json_path}: {e}")
         return None
@@ -98,9 +98,9 @@ class Displayer:
             value = None
             if data_source in time_dict:
                 value = time_dict[data_source]
-            elif data_source in Metrics.METRICS_KEYS:
+            elif Metrics.is_data_source(data_source):
                 metrics_vals = self.metrics.get_metrics(self.temp_unit)
-                value = int(metrics_vals[data_source])
+                value = int(metrics_vals.get(data_source, 0))
             if value is not None:
                 digit_count = self.device_config.get_digit_count(led_group)
                 if digit_count<len(str(value)):
@@ -124,19 +124,18 @@ class Displayer:
             "minutes": now.minute,
             "seconds": now.second,
         }
-        colors = self.metrics_colors
         for led_group, data_source in mappings.items():
             if data_source in ["hours", "minutes", "seconds"]:
                 colors[self.leds_indexes[led_group]] = self.time_colors[self.leds_indexes[led_group]]
             self._apply_mapping(leds, led_group, data_source, time_dict)
         
 
-    def _get_state_from_config(self, display_mode, cpt, leds, colors):
+    def _get_state_from_config(self, display_mode, elapsed, leds, colors):
         """Get display state using JSON-based device configuration."""
         nb_displays = 1
         display_mode_config = self.device_config.get_display_mode(display_mode)
         if not display_mode_config:
-            return leds, colors
+            return leds, colors, nb_displays
         
         if display_mode_config.type == "static":
             # Static display: apply mappings once
@@ -147,10 +146,10 @@ class Displayer:
             # Alternating display: cycle through displays
             displays = display_mode_config.displays
             if not displays:
-                return leds, colors
+                return leds, colors, nb_displays
             nb_displays = len(displays)
-            # Calculate which display to show based on cpt and interval
-            display_index = (cpt // self.cycle_duration) % len(displays)
+            # Calculate which display to show based on the elapsed time and cycle duration (seconds)
+            display_index = int(elapsed // self.cycle_duration) % len(displays)
             current_display = displays[display_index]
             if isinstance(current_display, str):
                 current_display = self.device_config.get_display_mode(current_display).mode_dict
@@ -159,32 +158,33 @@ class Displayer:
         
         return leds, colors, nb_displays
 
-    def get_state(self, display_mode, cpt):
-        """Get the LED state and colors for the current display mode."""
+    def get_state(self, display_mode, elapsed):
+        """Get the LED state and colors for the current display mode, elapsed seconds since start."""
         leds = np.array([0] * self.number_of_leds)
-        colors = self.metrics_colors
+        # copy so that time colors applied to this frame do not leak into the cached metrics colors
+        colors = self.metrics_colors.copy()
         
         # Use JSON-based config if available
         if self.device_config:
-            return self._get_state_from_config(display_mode, cpt, leds, colors)
+            return self._get_state_from_config(display_mode, elapsed, leds, colors)
         
-        return leds, colors
+        return leds, colors, 1
 
 
 class DisplayerFactory:
-    """Factory that returns a displayer instance. It reuses the existing instance
-    if configuration hasn't changed; otherwise it creates a new one."""
-    instance = None
+    """Factory that returns a displayer instance per device key. It reuses the existing
+    instance if configuration hasn't changed; otherwise it creates a new one."""
+    instances = {}
 
     @classmethod
-    def get_displayer(cls, leds_indexes, number_of_leds, metrics, metrics_colors, time_colors, temp_unit, metrics_min_value, metrics_max_value, update_interval, cycle_duration, device_config=None):
-        # Create new instance only if no instance exists
-        if cls.instance is None:
+    def get_displayer(cls, leds_indexes, number_of_leds, metrics, metrics_colors, time_colors, temp_unit, metrics_min_value, metrics_max_value, update_interval, cycle_duration, device_config=None, key=0):
+        # Create new instance only if no instance exists for this device
+        if key not in cls.instances:
             inst = Displayer(leds_indexes, number_of_leds, metrics, metrics_colors, time_colors, temp_unit, metrics_min_value, metrics_max_value, update_interval, cycle_duration, device_config=device_config)
-            cls.instance = inst
+            cls.instances[key] = inst
         else:
             # Update existing instance's attributes
-            inst = cls.instance
+            inst = cls.instances[key]
             inst.leds_indexes = leds_indexes
             inst.number_of_leds = number_of_leds
             inst.metrics = metrics
@@ -196,4 +196,4 @@ class DisplayerFactory:
             inst.update_interval = update_interval
             inst.cycle_duration = cycle_duration
             inst.device_config = device_config
-        return cls.instance
\ No newline at end of file
+        return inst
@@ -0,0 +1,174 @@
+"""Serve the sampled metrics in the OpenMetrics text format, for Prometheus.
+
+The exporter reads the snapshot published by the MetricsSampler, so the sensors are
+only sampled once for the displays and the scrapes. A snapshot is serialized at most
+once, by the first scrape that sees it; the following scrapes reuse the text until
+the sampler publishes a new one. Only the tick timing of the controller and of the
+sampler jobs, a few lines, is formatted at each scrape.
+
+Metrics are named digital_lcd_<data source>. The values of several devices (see
+sampler.get_indexed_values) are labelled, e.g. digital_lcd_gpu_temp{gpu="1"}, and
+then replace the unlabelled value of the first device. The metrics that no function
+could read on this host are left out rather than exported as 0.
+
+Address, "metrics_exporter" in config.json or DIGITAL_LCD_EXPORTER:
+    9101, "9101" or "127.0.0.1:9101"    HTTP on localhost (or the given host), port 9101
+    "unix:/run/digital_lcd.sock"        HTTP on a Unix socket
+"""
+import math
+import os
+import re
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics import Metrics
+
+
+PREFIX = "digital_lcd_"
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+DEFAULT_HOST = "127.0.0.1"
+INDEXED_DEVICE_PATTERN = re.compile(r"^(?P<device>[a-z]+?)(?P<index>\d+)_(?P<metric>[a-z_]+)$")
+
+
+def format_value(value):
+    if not isinstance(value, float):
+        return str(int(value))
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def get_metric_name(name):
+    return PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def serialize_snapshot(snapshot, unavailable=()):
+    """The OpenMetrics text of a metrics snapshot, without the final # EOF.
+
+    unavailable are the metric families (see Metrics.get_family) to leave out.
+    """
+    families = {}  # metric name -> [(labels, value)]
+    for name, value in sorted(snapshot.items()):
+        if value is None or Metrics.get_family(Metrics.get_base_metric(name) or name) in unavailable:
+            continue
+        match = INDEXED_DEVICE_PATTERN.match(name)
+        if match is not None and Metrics.get_family(name) is not None:
+            device = match["device"]
+            family = families.setdefault(get_metric_name(f"{device}_{match['metric']}"), [])
+            if family and not family[0][0]:
+                family.pop(0)  # the unlabelled value of the first device
+            family.append((f'{{{device}="{match["index"]}"}}', value))
+        else:
+            family = families.setdefault(get_metric_name(name), [])
+            if not family:
+                family.append(("", value))
+    lines = []
+    for metric, samples in families.items():
+        lines.append(f"# TYPE {metric} gauge")
+        lines.extend(f"{metric}{labels} {format_value(value)}" for labels, value in samples)
+    return "".join(line + "\n" for line in lines)
+
+
+def serialize_timing(scheduler, sampler):
+    """The OpenMetrics text of the controller ticks and of the sampler job runs."""
+    lines = []
+    if scheduler is not None:
+        for name, value, help_text in (
+            ("ticks", scheduler.ticks, "Display loop ticks run"),
+            ("tick_overruns", scheduler.overruns, "Ticks that started late because the work overran"),
+            ("missed_ticks", scheduler.missed_ticks, "Deadlines skipped after an overrun"),
+            ("idle_ticks", scheduler.idle_ticks, "Deadlines skipped because nothing changed"),
+        ):
+            lines += [f"# TYPE {PREFIX}{name} counter", f"# HELP {PREFIX}{name} {help_text}.",
+                      f"{PREFIX}{name}_total {value}"]
+        lines += [f"# TYPE {PREFIX}tick_interval_seconds gauge", f"{PREFIX}tick_interval_seconds {scheduler.interval!r}"]
+    jobs = list(sampler.jobs.items())
+    if jobs:
+        lines += [f"# TYPE {PREFIX}sampler_runs counter", f"# HELP {PREFIX}sampler_runs Runs of each sampler job."]
+        lines += [f'{PREFIX}sampler_runs_total{{job="{name}"}} {job.runs}' for name, job in jobs]
+        lines += [f"# TYPE {PREFIX}sampler_duration_seconds gauge",
+                  f"# HELP {PREFIX}sampler_duration_seconds Duration of the last run of each sampler job."]
+        lines += [f'{PREFIX}sampler_duration_seconds{{job="{name}"}} {job.last_duration!r}' for name, job in jobs]
+        lines += [f"# TYPE {PREFIX}sampler_active gauge"]
+        lines += [f'{PREFIX}sampler_active{{job="{name}"}} {int(job.active)}' for name, job in jobs]
+    return "".join(line + "\n" for line in lines)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class MetricsExporter:
+    """Serve the snapshots of the Metrics sampler over HTTP, see the module docstring."""
+
+    def __init__(self, address, metrics, scheduler=None):
+        self.address = address
+        self.metrics = metrics
+        self.sampler = metrics.sampler
+        self.scheduler = scheduler  # FixedRateScheduler of the display loop, for the tick timing
+        self.lock = threading.Lock()
+        self.version = None  # sampler version of the serialized snapshot
+        self.text = ""
+        self.socket_path = None
+        self.server = self.create_server(address)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-exporter", daemon=True)
+        self.thread.start()
+
+    def create_server(self, address):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = exporter.get_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def address_string(self):
+                return self.client_address[0] if self.client_address else "unix"
+
+            def log_message(self, format, *args):
+                pass
+
+        address = str(address)
+        if address.startswith("unix:"):
+            self.socket_path = address[len("unix:"):]
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)  # left by a previous run
+            return UnixHTTPServer(self.socket_path, Handler)
+        host, _, port = address.rpartition(":")
+        server = ThreadingHTTPServer((host or DEFAULT_HOST, int(port)), Handler)
+        server.daemon_threads = True
+        return server
+
+    def get_snapshot_text(self):
+        with self.lock:
+            # version and snapshot are read without the sampler lock: at worst a newer
+            # snapshot is kept with the previous version and serialized again next time
+            version = self.sampler.version
+            if version != self.version:
+                # Not fixed at startup, the metrics probed in the background can still get a function
+                unavailable = {metric for metric, function in self.metrics.metrics_functions.items() if function is None}
+                self.text = serialize_snapshot(self.sampler.snapshot, unavailable)
+                self.version = version
+            return self.text
+
+    def get_text(self):
+        return self.get_snapshot_text() + serialize_timing(self.scheduler, self.sampler) + "# EOF\n"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self.socket_path is not None:
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+REPORT_SIZE = 64  # Size of a HID report, without the report id byte
+
+
+class FrameEncoder:
+    """Encode a LED mask and its colors into the HID reports understood by the device.
+
+    The whole frame lives in one preallocated bytearray: the first report starts with
+    the header followed by the beginning of the payload, every following report is a
+    report id (0) followed by the next REPORT_SIZE bytes of payload. The payload is
+    three bytes (RGB) per LED followed by 0xFF padding: one padding byte for each hex
+    character missing to reach minimum_message_length, as the devices have always
+    received it.
+    Header, report ids and padding are written once, only the LED colors are
+    rewritten at each frame.
+    """
+
+    def __init__(self, number_of_leds, header, minimum_message_length, report_size=REPORT_SIZE):
+        self.number_of_leds = number_of_leds
+        self.header = bytes.fromhex(header) if isinstance(header, str) else bytes(header)
+        self.report_size = report_size
+        payload_length = 3 * number_of_leds + max(0, minimum_message_length - 6 * number_of_leds)
+
+        # Split the payload in reports and remember where each payload byte lands in the frame
+        first_chunk = min(payload_length, report_size - len(self.header))
+        chunks = [first_chunk]
+        remaining = payload_length - first_chunk
+        while remaining > 0:
+            chunks.append(min(remaining, report_size))
+            remaining -= chunks[-1]
+        self.frame = bytearray(len(self.header) + payload_length + len(chunks) - 1)
+        self.frame_array = np.frombuffer(self.frame, dtype=np.uint8)
+        payload_index = []
+        self.report_bounds = []
+        offset = 0
+        for i, chunk in enumerate(chunks):
+            prefix = len(self.header) if i == 0 else 1
+            payload_index.append(np.arange(offset + prefix, offset + prefix + chunk))
+            self.report_bounds.append((offset, offset + prefix + chunk))
+            offset += prefix + chunk
+        self.payload_index = np.concatenate(payload_index)[:3 * number_of_leds]
+
+        self.frame_array[:] = 0xFF
+        self.frame[:len(self.header)] = self.header
+        for start, _ in self.report_bounds[1:]:
+            self.frame[start] = 0
+        view = memoryview(self.frame)
+        self.reports = [view[start:end] for start, end in self.report_bounds]
+
+        self.rgb = np.zeros((number_of_leds, 3), dtype=np.uint8)
+        self.masked_rgb = np.zeros((number_of_leds, 3), dtype=np.uint8)
+        self.mask = np.zeros((number_of_leds, 1), dtype=np.uint8)
+        self.colors_key = None
+
+    def set_colors(self, colors):
+        """Update the RGB buffer from an array of hex colors, parsing only when they changed."""
+        colors = np.asarray(colors)
+        key = colors.tobytes()
+        if key == self.colors_key:
+            return
+        self.colors_key = key
+        rgb = np.frombuffer(bytes.fromhex("".join(colors[:self.number_of_leds])), dtype=np.uint8)
+        self.rgb[:] = 0
+        self.rgb.reshape(-1)[:len(rgb)] = rgb
+
+    def encode(self, leds, colors):
+        """Fill the frame for the given LED mask and colors and return one memoryview per report."""
+        self.set_colors(colors)
+        np.not_equal(leds, 0, out=self.mask[:, 0])
+        np.multiply(self.rgb, self.mask, out=self.masked_rgb)
+        self.frame_array[self.payload_index] = self.masked_rgb.reshape(-1)
+        return self.reports
@@ -0,0 +1,184 @@
+"""Interchangeable backends used to reach the devices.
+
+The controller only needs enumerate() and open() from a backend, and write()/close()
+from the opened device, so the real hidapi devices can be replaced by stand-ins to run
+and measure the whole render and encode pipeline without the hardware:
+
+    hid                  real devices through hidapi (default)
+    null                 reports are discarded
+    file:<path>          reports are appended, raw, to <path>
+    socket:<path>        each report is sent as one datagram to the Unix socket <path>
+    loopback:<gap>       reports sent less than <gap> seconds apart are rejected
+
+The backend is chosen with the "backend" key of config.json or the DIGITAL_LCD_BACKEND
+environment variable, which takes precedence. Stand-ins expose MAX_DEVICES devices that
+match any serial number or path; device number i > 0 writes to "<path>.<i>".
+"""
+import os
+import socket
+import time
+
+
+class HidBackend:
+    """Real devices, through hidapi."""
+
+    name = "hid"
+
+    def enumerate(self, vendor_id, product_id):
+        import hid
+        return hid.enumerate(vendor_id, product_id)
+
+    def open(self, path=None, vendor_id=None, product_id=None):
+        import hid
+        if path is not None:
+            return hid.Device(path=path)
+        return hid.Device(vendor_id, product_id)
+
+
+class NullDevice:
+    """Stand-in device that discards the reports."""
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class FileDevice:
+    """Stand-in device that appends the raw reports to a file."""
+
+    def __init__(self, path):
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def write(self, data):
+        return os.write(self.fd, data)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SocketDevice:
+    """Stand-in device that sends each report as a datagram to a Unix socket.
+
+    Reports are dropped (and counted) while nobody listens on the socket.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.reports_dropped = 0
+
+    def write(self, data):
+        try:
+            self.socket.sendto(data, self.path)
+        except OSError:
+            self.reports_dropped += 1
+        return len(data)
+
+    def close(self):
+        self.socket.close()
+
+
+class LoopbackDevice:
+    """Stand-in for a HID device that drops reports written less than min_gap apart.
+
+    Like a real device, it does not tell the writer: the dropped reports are only counted.
+    """
+
+    def __init__(self, min_gap):
+        self.min_gap = min_gap
+        self.last_write = None
+        self.reports_written = 0
+        self.reports_dropped = 0
+
+    def write(self, data):
+        now = time.monotonic()
+        too_fast = self.last_write is not None and now - self.last_write < self.min_gap
+        self.last_write = now
+        if too_fast:
+            self.reports_dropped += 1
+        else:
+            self.reports_written += 1
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class StandInBackend:
+    """Base class of the backends that replace the devices."""
+
+    name = None
+    MAX_DEVICES = 8
+
+    def __init__(self, target=None):
+        self.target = target
+
+    def enumerate(self, vendor_id, product_id):
+        return [
+            {
+                'path': f"{self.name}:{index}".encode(),
+                'vendor_id': vendor_id,
+                'product_id': product_id,
+                'serial_number': None,
+                'stand_in': True,
+            }
+            for index in range(self.MAX_DEVICES)
+        ]
+
+    def open(self, path=None, vendor_id=None, product_id=None):
+        index = int(path.split(b":")[-1]) if path is not None else 0
+        return self.open_device(index)
+
+    def get_target(self, index):
+        return self.target if index == 0 else f"{self.target}.{index}"
+
+    def open_device(self, index):
+        raise NotImplementedError
+
+
+class NullBackend(StandInBackend):
+    name = "null"
+
+    def open_device(self, index):
+        return NullDevice()
+
+
+class FileBackend(StandInBackend):
+    name = "file"
+
+    def open_device(self, index):
+        return FileDevice(self.get_target(index))
+
+
+class SocketBackend(StandInBackend):
+    name = "socket"
+
+    def open_device(self, index):
+        return SocketDevice(self.get_target(index))
+
+
+class LoopbackBackend(StandInBackend):
+    name = "loopback"
+
+    def open_device(self, index):
+        return LoopbackDevice(float(self.target or 0))
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (HidBackend, NullBackend, FileBackend, SocketBackend, LoopbackBackend)
+}
+
+
+def get_backend(spec):
+    """Build a backend from a "name[:argument]" spec, see the module docstring."""
+    name, _, argument = (spec or "hid").partition(":")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of {', '.join(BACKENDS)}.")
+    if name == "hid":
+        return HidBackend()
+    if name in ("file", "socket") and not argument:
+        raise ValueError(f"Backend '{name}' needs a path, e.g. {name}:/tmp/digital_lcd")
+    return BACKENDS[name](argument or None)
@@ -0,0 +1,67 @@
+import threading
+import time
+
+
+class HidWriter(threading.Thread):
+    """Write frames to the device from a dedicated thread.
+
+    The render loop hands frames over with publish(), which never blocks on the device.
+    Only the most recent frame is kept: if the device falls behind, frames published
+    while a write is in progress replace each other and only the latest one is written.
+    A frame is always written completely, reports are never mixed between two frames.
+    """
+
+    def __init__(self, dev, report_gap=0, recorder=None, device_id=0):
+        super().__init__(name="hid-writer", daemon=True)
+        self.dev = dev
+        self.report_gap = report_gap  # minimum delay between two reports, in seconds
+        self.recorder = recorder  # Optional capture.FrameRecorder receiving every frame written
+        self.device_id = device_id
+        self.condition = threading.Condition()
+        self.pending = None  # (frame, report_bounds) waiting to be written
+        self.running = True
+        self.frames_written = 0
+        self.frames_dropped = 0
+        self.error = None
+
+    def publish(self, frame, report_bounds):
+        """Queue a frame (bytes) split in reports by report_bounds [(start, end), ...]."""
+        with self.condition:
+            if self.pending is not None:
+                self.frames_dropped += 1
+            self.pending = (frame, report_bounds)
+            self.condition.notify()
+
+    def write_frame(self, frame, report_bounds):
+        """Write one frame synchronously, pacing the reports with report_gap."""
+        for start, end in report_bounds:
+            written = self.dev.write(frame[start:end])
+            if isinstance(written, int) and 0 <= written < end - start:
+                raise IOError(f"short write ({written}/{end - start} bytes)")
+            if self.report_gap:
+                time.sleep(self.report_gap)  # small delay to avoid overwhelming the device
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and self.running:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                frame, report_bounds = self.pending
+                self.pending = None
+            try:
+                timestamp = time.monotonic()
+                self.write_frame(frame, report_bounds)
+                self.frames_written += 1
+                if self.recorder is not None:
+                    self.recorder.record(timestamp, self.device_id, frame, report_bounds)
+            except Exception as e:
+                print(f"Error writing to HID device: {e}")
+                self.error = e
+                return
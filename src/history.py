@@ -0,0 +1,199 @@
+"""History of the metrics, and the data sources derived from it.
+
+Each metric keeps its last HISTORY_SIZE samples, with their time.monotonic()
+timestamps, in NumPy ring buffers. Derived data sources are named after the metric:
+
+    <metric>_avg<N>s    average over the last N seconds, e.g. cpu_temp_avg10s
+    <metric>_max<N>s    maximum over the last N seconds, e.g. gpu_power_max30s
+    <metric>_min<N>s    minimum over the last N seconds
+    <metric>_ema        exponential moving average, time constant EMA_TIME_CONSTANT
+    <metric>_ema<N>s    exponential moving average, time constant N seconds
+
+They are updated at each sample in O(1) (amortized): the average keeps a running sum
+of the samples in its window, the maximum and minimum a monotonic queue of them.
+A window never covers more than the HISTORY_SIZE last samples.
+"""
+import math
+import re
+import threading
+from collections import deque
+
+import numpy as np
+
+
+HISTORY_SIZE = 1024  # samples kept per metric
+EMA_TIME_CONSTANT = 5.0  # seconds
+SOURCE_PATTERN = re.compile(r"^(?P<metric>.+)_(?P<kind>avg|max|min|ema)(?P<window>\d+(?:\.\d+)?s)?$")
+
+
+def parse_source_name(name):
+    """Split a derived source name into (metric, kind, window), None if it is not one."""
+    match = SOURCE_PATTERN.match(name)
+    if match is None:
+        return None
+    kind = match.group("kind")
+    window = match.group("window")
+    if window is None:
+        if kind != "ema":
+            return None
+        return match.group("metric"), kind, EMA_TIME_CONSTANT
+    window = float(window[:-1])
+    if window <= 0:
+        return None
+    return match.group("metric"), kind, window
+
+
+class WindowAverage:
+    def __init__(self, window):
+        self.window = window
+        self.start = None  # index of the oldest sample in the window
+        self.total = 0.0
+        self.value = None
+
+    def evict(self, history, index, timestamp):
+        if self.start is None:
+            return
+        while self.start < index and (self.start <= index - history.capacity
+                                      or history.get_time(self.start) < timestamp - self.window):
+            self.total -= history.get_value(self.start)
+            self.start += 1
+
+    def add(self, history, index, timestamp, value):
+        if self.start is None:
+            self.start = index
+        self.total += value
+        self.value = self.total / (index + 1 - self.start)
+
+
+class WindowExtremum:
+    """Maximum (or minimum, with sign=-1) over the window, from a monotonic queue of sample indexes."""
+
+    def __init__(self, window, sign=1):
+        self.window = window
+        self.sign = sign
+        self.queue = deque()
+        self.value = None
+
+    def evict(self, history, index, timestamp):
+        queue = self.queue
+        while queue and (queue[0] <= index - history.capacity
+                         or history.get_time(queue[0]) < timestamp - self.window):
+            queue.popleft()
+
+    def add(self, history, index, timestamp, value):
+        queue = self.queue
+        while queue and self.sign * history.get_value(queue[-1]) <= self.sign * value:
+            queue.pop()
+        queue.append(index)
+        self.value = history.get_value(queue[0])
+
+
+class ExponentialAverage:
+    def __init__(self, time_constant):
+        self.time_constant = time_constant
+        self.last_time = None
+        self.value = None
+
+    def evict(self, history, index, timestamp):
+        pass
+
+    def add(self, history, index, timestamp, value):
+        if self.value is None:
+            self.value = float(value)
+        else:
+            alpha = 1 - math.exp(-(timestamp - self.last_time) / self.time_constant)
+            self.value += alpha * (value - self.value)
+        self.last_time = timestamp
+
+
+def make_source(kind, window):
+    if kind == "avg":
+        return WindowAverage(window)
+    if kind == "max":
+        return WindowExtremum(window)
+    if kind == "min":
+        return WindowExtremum(window, sign=-1)
+    return ExponentialAverage(window)
+
+
+class MetricHistory:
+    """Ring buffer of the samples of one metric, and the sources derived from it.
+
+    Only one thread (the sampler job of the metric) appends samples, the lock keeps
+    the sources added by other threads consistent with them.
+    """
+
+    def __init__(self, capacity=HISTORY_SIZE):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.values = np.zeros(capacity)
+        self.count = 0  # samples appended since the start, the next sample index
+        self.sources = {}  # name -> derived source
+        self.lock = threading.Lock()
+
+    def get_time(self, index):
+        return float(self.times[index % self.capacity])
+
+    def get_value(self, index):
+        return float(self.values[index % self.capacity])
+
+    def get_samples(self):
+        """(timestamps, values) of the samples kept, oldest first."""
+        start = max(0, self.count - self.capacity)
+        indexes = np.arange(start, self.count) % self.capacity
+        return self.times[indexes], self.values[indexes]
+
+    def add_source(self, name, kind, window):
+        """Add a derived source, computed at once over the samples already kept."""
+        with self.lock:
+            if name not in self.sources:
+                source = make_source(kind, window)
+                for index in range(max(0, self.count - self.capacity), self.count):
+                    timestamp, value = self.get_time(index), self.get_value(index)
+                    source.evict(self, index, timestamp)
+                    source.add(self, index, timestamp, value)
+                self.sources[name] = source
+            return self.sources[name]
+
+    def append(self, timestamp, value):
+        """Append a sample, return the new values of the derived sources."""
+        with self.lock:
+            index = self.count
+            sources = self.sources.values()
+            for source in sources:
+                source.evict(self, index, timestamp)  # before the slot of the oldest sample is overwritten
+            slot = index % self.capacity
+            self.times[slot] = timestamp
+            self.values[slot] = value
+            self.count = index + 1
+            for source in sources:
+                source.add(self, index, timestamp, value)
+            return {name: source.value for name, source in self.sources.items()}
+
+
+class MetricsHistory:
+    """The history of every metric, see the module docstring."""
+
+    def __init__(self, capacity=HISTORY_SIZE):
+        self.capacity = capacity
+        self.metrics = {}  # metric -> MetricHistory, created at its first sample or source
+
+    def get_history(self, metric):
+        history = self.metrics.get(metric)
+        if history is None:
+            history = self.metrics.setdefault(metric, MetricHistory(self.capacity))
+        return history
+
+    def add_source(self, name):
+        """Start computing a derived source, return its current value (None without samples)."""
+        metric, kind, window = parse_source_name(name)
+        return self.get_history(metric).add_source(name, kind, window).value
+
+    def record(self, timestamp, values):
+        """Append the sampled values, return them with the values of their derived sources."""
+        derived = {}
+        for metric, value in values.items():
+            derived.update(self.get_history(metric).append(timestamp, value))
+        if derived:
+            values = dict(values, **derived)
+        return values
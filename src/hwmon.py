@@ -0,0 +1,231 @@
+"""Sensors of /sys/class/hwmon, by chip and label.
+
+The registry scans /sys/class/hwmon once and indexes every sensor input as
+"<chip>/<label>", e.g. "k10temp/Tctl", "k10temp/Tccd1", "nvme/Composite",
+"amdgpu/edge", where chip is the driver name (the second chip with the same name is
+"nvme.1", the third "nvme.2"...) and label the content of the <sensor>_label file. Every
+sensor is also indexed by its file prefix, e.g. "k10temp/temp1". The sensors are read
+through the persistent files of the sysfs module.
+
+The registry is scanned again, at most every RESCAN_INTERVAL seconds, only when a
+sensor cannot be read anymore or an unknown sensor is asked for, i.e. after a device
+was unplugged or plugged in. A sensor still unknown after that rescan is reported
+once and no longer triggers rescans, a later rescan can still find it.
+
+Any sensor can be used as a data source named "hwmon:<chip>/<label>", e.g.
+"hwmon:k10temp/Tccd2". Values are in °C, V, A, W, J, RPM, MHz and %.
+"""
+import os
+import re
+import threading
+import time
+
+from sampler import BatchedBackend
+from sysfs import SysfsFile
+
+
+HWMON_PATH = "/sys/class/hwmon"
+SOURCE_PREFIX = "hwmon:"
+RESCAN_INTERVAL = 5  # seconds
+INPUT_PATTERN = re.compile(r"^(?P<kind>[a-z]+)(?P<index>\d+)_(?P<attribute>input|average)$")
+SCALES = {
+    "temp": 1000,  # millidegrees Celsius
+    "in": 1000,  # millivolts
+    "curr": 1000,  # milliamperes
+    "power": 1000000,  # microwatts
+    "energy": 1000000,  # microjoules
+    "fan": 1,  # RPM
+    "freq": 1000000,  # hertz
+    "humidity": 1000,  # milli-percent
+}
+CPU_CHIPS = ['coretemp', 'cpu_thermal', 'k10temp', 'acpitz']  # in the order psutil was asked for them
+GPU_CHIPS = {"amdgpu", "radeon", "nouveau", "i915", "xe"}
+
+
+class HwmonSensor:
+    def __init__(self, chip, kind, prefix, path):
+        self.chip = chip  # driver name, e.g. k10temp
+        self.kind = kind  # temp, fan, power...
+        self.prefix = prefix  # e.g. temp1
+        self.file = SysfsFile(path)
+
+    def read(self):
+        return self.file.read_int() / SCALES[self.kind]
+
+
+def read_attribute(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def sort_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+def scan_chip(path, chip):
+    """{label: HwmonSensor} of a hwmon directory, the labels and the file prefixes."""
+    sensors = {}
+    inputs = {}
+    try:
+        entries = sorted(os.listdir(path), key=sort_key)
+    except OSError:
+        return sensors
+    for entry in entries:
+        match = INPUT_PATTERN.match(entry)
+        if match is None or match["kind"] not in SCALES:
+            continue
+        prefix = f"{match['kind']}{match['index']}"
+        if match["attribute"] == "average" and prefix in inputs:
+            continue
+        inputs[prefix] = HwmonSensor(chip, match["kind"], prefix, os.path.join(path, entry))
+    for prefix, sensor in inputs.items():
+        label = read_attribute(os.path.join(path, f"{prefix}_label"))
+        if label:
+            sensors.setdefault(label, sensor)
+    for prefix, sensor in inputs.items():
+        sensors.setdefault(prefix, sensor)
+    return sensors
+
+
+class HwmonRegistry:
+    """The hwmon sensors by "<chip>/<label>", see the module docstring."""
+
+    def __init__(self, base_path=HWMON_PATH):
+        self.base_path = base_path
+        self.sensors = {}  # "<chip>/<label>" -> HwmonSensor
+        self.chips = {}  # chip key -> driver name, in the hwmon order
+        self.last_scan = 0
+        self.unknown = set()  # keys not found by a rescan, see read()
+        self.lock = threading.Lock()
+        self.scan()
+
+    def scan(self):
+        sensors = {}
+        chips = {}
+        try:
+            entries = sorted(os.listdir(self.base_path), key=sort_key)
+        except OSError:
+            entries = []
+        for entry in entries:
+            path = os.path.join(self.base_path, entry)
+            name = read_attribute(os.path.join(path, "name"))
+            if not name:
+                continue
+            chip = name
+            count = 1
+            while chip in chips:
+                chip = f"{name}.{count}"
+                count += 1
+            chips[chip] = name
+            for label, sensor in scan_chip(path, name).items():
+                sensors[f"{chip}/{label}"] = sensor
+        for sensor in self.sensors.values():
+            sensor.file.close()
+        self.sensors = sensors
+        self.chips = chips
+        self.last_scan = time.monotonic()
+
+    def rescan(self):
+        """Scan again, unless the last scan is more recent than RESCAN_INTERVAL. Return whether it did."""
+        with self.lock:
+            if time.monotonic() - self.last_scan < RESCAN_INTERVAL:
+                return False
+            self.scan()
+            return True
+
+    def read(self, key):
+        """The value of a sensor, None if it does not exist or cannot be read."""
+        for attempt in range(2):
+            sensor = self.sensors.get(key)
+            if sensor is None and key in self.unknown:
+                return None
+            try:
+                if sensor is not None:
+                    return sensor.read()
+            except (OSError, ValueError):
+                pass
+            if attempt or not self.rescan():
+                break
+        if key not in self.sensors and key not in self.unknown and attempt:
+            print(f"Warning: hwmon sensor {key} not found.")
+            self.unknown.add(key)
+        return None
+
+    def get_kind(self, key):
+        sensor = self.sensors.get(key)
+        return sensor.kind if sensor is not None else None
+
+    def find_first(self, chip_names, kind="temp"):
+        """The key of the first sensor of the given kind, on the first chip found among chip_names."""
+        for name in chip_names:
+            for key, sensor in self.sensors.items():
+                if key == f"{name}/{sensor.prefix}" and sensor.kind == kind:
+                    return key
+        return None
+
+    def close(self):
+        for sensor in self.sensors.values():
+            sensor.file.close()
+
+
+_registry = None
+
+
+def get_registry():
+    """The registry shared by the backend and the range lookups, scanned at the first call."""
+    global _registry
+    if _registry is None:
+        _registry = HwmonRegistry()
+    return _registry
+
+
+def is_source(name):
+    return name.startswith(SOURCE_PREFIX) and "/" in name
+
+
+def get_range_metric(name):
+    """The metric whose range and temperature unit apply to a hwmon source, None for other than temperatures."""
+    key = name[len(SOURCE_PREFIX):]
+    if get_registry().get_kind(key) != "temp":
+        return None
+    chip = get_registry().chips.get(key.split("/", 1)[0])
+    if chip in GPU_CHIPS:
+        return "gpu_temp"
+    return "nvme_temp" if chip == "nvme" else "cpu_temp"
+
+
+class HwmonBackend(BatchedBackend):
+    """Read the hwmon sources in use, and cpu_temp and nvme_temp from the usual chips when they are in use."""
+
+    name = "hwmon"
+
+    def __init__(self):
+        self.registry = get_registry()
+        self.sources = ()  # names to sample, see set_sources()
+        self.metric_keys = {
+            "cpu_temp": self.registry.find_first(CPU_CHIPS),
+            "nvme_temp": self.registry.find_first(["nvme"]),
+        }
+
+    def set_sources(self, names):
+        """Sample the given "hwmon:<chip>/<label>" sources, and cpu_temp or nvme_temp, from now on."""
+        self.sources = tuple(names)
+
+    def read(self, name):
+        key = self.metric_keys[name] if name in self.metric_keys else name[len(SOURCE_PREFIX):]
+        return self.registry.read(key) if key else None
+
+    def sample(self):
+        return {name: self.read(name) for name in self.sources}
+
+    def close(self):
+        self.registry.close()  # the files are reopened by the next sample
+
+    def get_cpu_temp(self):
+        return self.read("cpu_temp")
+
+    def get_nvme_temp(self):
+        return self.read("nvme_temp")
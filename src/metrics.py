@@ -1,16 +1,24 @@
+import glob
 import subprocess
 import re
 import psutil
 import time
 import os
-
-from get_amd_power import CPUPower
-
-try:
-    import pyamdgpuinfo
-except Exception as e:
-    print("pyamdgpuinfo cannot start : ",str(e))
-
+import threading
+from functools import lru_cache, partial
+
+from amdgpu import AmdGpuBackend, PyAmdGpuInfoBackend
+from cpufreq import CpuFreqBackend
+from cpustat import ProcStatBackend
+from nvidia import NvidiaSmiBackend, NvmlBackend
+from nvme import NvmeBackend
+from history import MetricsHistory, parse_source_name
+import hwmon
+from hwmon import HwmonBackend
+from probe import choose_functions, probe_candidates, remember_functions
+from rapl import RaplBackend
+from sampler import BatchedBackend, MetricsSampler
+import sysfs
 
 
 class Metrics:
@@ -27,158 +35,317 @@ class Metrics:
         "nvme_read_speed",
         "nvme_write_speed",
         "nvme_usage",
+        "cpu_package_power",
+        "cpu_core_power",
+        "cpu_dram_power",
     ]
+    # Metrics read for several devices, as <device><index>_<metric> and <device>_max_<metric>
+    # (and _min_), e.g. core3_usage and core_max_usage for the "core_usage" family
+    INDEXED_KEYS = [
+        "core_usage",
+        "ccd_usage",
+        "core_frequency",
+        "gpu_temp",
+        "gpu_usage",
+        "gpu_frequency",
+        "gpu_power",
+        "nvme_temp",
+        "nvme_read_speed",
+        "nvme_write_speed",
+        "nvme_usage",
+    ]
+    INDEXED_PATTERN = re.compile(r"^(?P<device>[a-z]+?)(?:\d+|_max|_min)_(?P<metric>[a-z_]+)$")
+    RANGE_KEYS = {"core_usage": "cpu_usage", "ccd_usage": "cpu_usage", "core_frequency": "cpu_frequency"}  # families using the min/max of another metric
+
     def __init__(self, update_interval=0.5, nvme_disk="nvme0n1"):
         self.update_interval = update_interval # seconds
         self.nvme_disk = nvme_disk
-        self.metrics_functions = {key: None for key in self.METRICS_KEYS}
+        self.metrics_functions = {key: None for key in dict.fromkeys(self.METRICS_KEYS + self.INDEXED_KEYS)}
         self.metrics = {key: 0 for key in self.METRICS_KEYS}
-        try:
-            device_count = pyamdgpuinfo.detect_gpus()
-            if device_count > 0:
-                self.gpu = pyamdgpuinfo.get_gpu(0)
-            else:
-                print("No AMD GPU detected.")
-                self.gpu = -1
-        except Exception:
-            print("pyamdgpuinfo not installed. GPU temperature will not be available.")
-            self.gpu = None
-        self.cpu_power_reader = CPUPower()
+        self.proc_stat = ProcStatBackend()
+        self.cpufreq = CpuFreqBackend()
+        self.rapl = RaplBackend()
+        self.nvml = NvmlBackend()
+        self.nvidia_smi = NvidiaSmiBackend(interval=update_interval)
+        self.amdgpu = AmdGpuBackend()
+        self.pyamdgpuinfo = PyAmdGpuInfoBackend()
+        self.nvme = NvmeBackend(nvme_disk)
+        self.hwmon = HwmonBackend()
+        self.backends = [self.proc_stat, self.cpufreq, self.rapl, self.nvml, self.nvidia_smi, self.amdgpu, self.pyamdgpuinfo, self.nvme, self.hwmon]
         candidates =  {
-            'cpu_temp': [get_cpu_temp_psutils,get_cpu_temp_linux,get_cpu_temp_windows_wmi,get_cpu_temp_windows_wintmp,get_cpu_temp_raspberry_pi],
-            'gpu_temp': [get_gpu_temp_nvidia,get_gpu_temp_wintemp, self.get_gpu_temp_amdgpuinfo],
-            'cpu_usage': [get_cpu_usage],
-            'gpu_usage': [get_gpu_usage_nvml,get_gpu_usage_nvidia_smi,self.get_gpu_usage_amd,],
-            'cpu_frequency': [get_cpu_frequency_psutil, get_cpu_frequency_proc],
-            'gpu_frequency': [get_gpu_frequency_nvml, get_gpu_frequency_nvidia_smi, get_gpu_frequency_nvidia_smi_alt, self.get_gpu_frequency_amdgpuinfo],
-            'cpu_power': [get_cpu_power_rapl, get_cpu_power_turbostat, self.get_cpu_power],
-            'gpu_power': [get_gpu_power_nvml, get_gpu_power_nvidia_smi, get_gpu_power_nvidia_smi_alt, self.get_gpu_power_amdgpuinfo],
-            'nvme_temp': [get_nvme_temp_psutil],
+            'cpu_temp': [self.hwmon.get_cpu_temp, get_cpu_temp_psutils,get_cpu_temp_linux,get_cpu_temp_windows_wmi,get_cpu_temp_windows_wintmp,get_cpu_temp_raspberry_pi],
+            'gpu_temp': [self.nvml.get_gpu_temp, self.nvidia_smi.get_gpu_temp, self.amdgpu.get_gpu_temp, get_gpu_temp_wintemp, self.pyamdgpuinfo.get_gpu_temp],
+            'cpu_usage': [self.proc_stat.get_cpu_usage, get_cpu_usage],
+            'gpu_usage': [self.nvml.get_gpu_usage, self.nvidia_smi.get_gpu_usage, self.amdgpu.get_gpu_usage, self.pyamdgpuinfo.get_gpu_usage],
+            'cpu_frequency': [self.cpufreq.get_cpu_frequency, get_cpu_frequency_psutil, get_cpu_frequency_proc],
+            'gpu_frequency': [self.nvml.get_gpu_frequency, self.nvidia_smi.get_gpu_frequency, get_gpu_frequency_nvidia_settings, self.amdgpu.get_gpu_frequency, self.pyamdgpuinfo.get_gpu_frequency],
+            'cpu_power': [self.rapl.get_cpu_power, get_cpu_power_turbostat],
+            'gpu_power': [self.nvml.get_gpu_power, self.nvidia_smi.get_gpu_power, self.amdgpu.get_gpu_power, get_gpu_power_drm_sysfs, self.pyamdgpuinfo.get_gpu_power],
+            'nvme_temp': [self.nvme.get_nvme_temp, self.hwmon.get_nvme_temp, get_nvme_temp_psutil],
+            'cpu_package_power': [self.rapl.get_cpu_package_power],
+            'cpu_core_power': [self.rapl.get_cpu_core_power],
+            'cpu_dram_power': [self.rapl.get_cpu_dram_power],
+            'core_usage': [self.proc_stat.get_core_max_usage],
+            'ccd_usage': [self.proc_stat.get_ccd_max_usage],
+            'core_frequency': [self.cpufreq.get_core_max_frequency],
         }
-        for metric, functions in candidates.items():
-            for function in functions:
-                try:
-                    result = function()
-                    if result is not None:
-                        self.metrics[metric] = int(result)
-                        self.metrics_functions[metric] = function
-                        break
-                except Exception:
-                    continue
-            if self.metrics_functions[metric] is None:
+        # The metrics without a cached function are probed again after the first frame, see probe_missing()
+        selected, self.missing_candidates = choose_functions(candidates)
+        # Not probed: the first sample has no speed yet, and nvme_disk (e.g. sda) is only set by the config
+        selected.update({
+            'nvme_read_speed': (self.nvme.get_nvme_read_speed, 0),
+            'nvme_write_speed': (self.nvme.get_nvme_write_speed, 0),
+            'nvme_usage': (self.nvme.get_nvme_usage, 0),
+        })
+        for metric in candidates:
+            if metric not in selected and metric not in self.missing_candidates:
                 print(f"Warning: No suitable function found for {metric}.")
-        self.last_update = 0
-        self.last_time = 0
-        self.last_disk_io = None
-        self.nvme = True
-
-    def get_metrics(self, temp_unit):
-        if time.time() - self.last_update < self.update_interval:
-            return self.metrics
-        else:
-            if self.nvme:
-                self.nvme = self.get_nvme_metrics()
-
-            for metric, function in self.metrics_functions.items():
-                if function is not None:
-                    try:
-                        result = function()
-                        if result is None:
-                            self.metrics[metric] = 0
-                        else:
-                            self.metrics[metric] = int(result)
-                    except Exception as e:
-                        print(f"Error getting {metric}: {e}")
-            self.last_update = time.time()
-        for device in ["cpu", "gpu"]:
-            if temp_unit[device] == "fahrenheit":
-                self.metrics[f"{device}_temp"] = int(self.metrics[f"{device}_temp"] * 9 / 5 + 32)
-        return self.metrics
+        self.converted_metrics = {}  # (cpu unit, gpu unit) -> metrics converted to these units
+        self.intervals = {}  # metric -> sampling interval, update_interval when missing
+        self.history = MetricsHistory()
+        self.sampler = MetricsSampler(self.metrics)
+        self.job_metrics = {}  # sampler job name -> metrics it samples
+        self.batch_metrics = {self.hwmon: ["hwmon"]}  # backend -> metrics read from it, hwmon for the hwmon:<chip>/<label> sources
+        self.active_sources = None  # the sources of the last set_active()
+        self.active_families = None  # the metric families of these sources, None for all
+        self.lock = threading.RLock()  # serializes the changes of the jobs by the probe thread
+        self.closed = False
+        self.add_functions(selected)
+        for backend in self.backends:
+            if backend not in self.batch_metrics:
+                backend.close()  # probed but not used
+
+    def add_functions(self, selected):
+        """Sample the metrics of {metric: (function, first value)}, in the job of their backend for the batched ones."""
+        self.sampler.publish({metric: int(result) for metric, (function, result) in selected.items()
+                              if metric in self.METRICS_KEYS})
+        batches = {backend: [] for backend in self.batch_metrics}
+        for metric, (function, result) in selected.items():
+            self.metrics_functions[metric] = function
+            backend = getattr(function, '__self__', None)
+            if isinstance(backend, BatchedBackend):
+                batches.setdefault(backend, []).append(metric)
+            else:
+                self.add_job(metric, partial(self.sample_metric, metric, function), (metric,))
+        for backend, metrics in batches.items():
+            backend_metrics = self.batch_metrics.setdefault(backend, [])
+            backend_metrics.extend(metrics)  # also read by the running job of the backend
+            if backend.name not in self.job_metrics:
+                # Paused backends are closed (e.g. the nvidia-smi stream stops), sample() reopens them
+                self.add_job(backend.name, partial(self.sample_batch, backend, backend_metrics),
+                             tuple(backend_metrics), backend.close)
+            elif metrics:
+                self.job_metrics = {**self.job_metrics, backend.name: tuple(backend_metrics)}
+        self.update_intervals()
+
+    def add_job(self, name, function, metrics, on_pause=None):
+        self.job_metrics = {**self.job_metrics, name: metrics}
+        self.sampler.add_job(name, partial(self.record, function), self.get_job_interval(metrics), on_pause)
+
+    def probe_missing(self):
+        """Probe again, in a background thread, the metrics that have no function from the cache of the last run."""
+        candidates, self.missing_candidates = self.missing_candidates, {}
+        # The backends with a running job are left out, their sample() is not safe to call from another thread
+        candidates = {
+            metric: [function for function in functions if getattr(function, '__self__', None) not in self.batch_metrics]
+            for metric, functions in candidates.items()
+        }
+        if candidates:
+            threading.Thread(target=self.add_missing, args=(candidates,), name="probe-missing", daemon=True).start()
+
+    def add_missing(self, candidates):
+        selected = probe_candidates(candidates)
+        remember_functions(selected)
+        for metric in candidates:
+            if metric not in selected:
+                print(f"Warning: No suitable function found for {metric}.")
+        with self.lock:
+            if self.closed:
+                return
+            if selected:
+                self.add_functions(selected)
+                self.set_active(self.active_sources)
+            for backend in self.backends:
+                if backend not in self.batch_metrics:
+                    backend.close()  # probed but not used
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_family(cls, metric):
+        """The key of a metric in METRICS_KEYS or INDEXED_KEYS (e.g. core_usage for core3_usage), None if unknown.
+
+        The family of the hwmon sensors (e.g. hwmon:k10temp/Tctl) is "hwmon".
+        """
+        if metric in cls.METRICS_KEYS:
+            return metric
+        if hwmon.is_source(metric) and parse_source_name(metric) is None:
+            return "hwmon"
+        match = cls.INDEXED_PATTERN.match(metric)
+        if match is not None and f"{match['device']}_{match['metric']}" in cls.INDEXED_KEYS:
+            return f"{match['device']}_{match['metric']}"
+        return None
 
-    def set_nvme_disk(self, nvme_disk):
-        if nvme_disk != self.nvme_disk:
-            self.nvme = True
-        self.nvme_disk = nvme_disk
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_base_metric(cls, name):
+        """The metric a data source is computed from (itself for a metric), None if it is not a data source."""
+        if cls.get_family(name) is not None:
+            return name
+        parsed = parse_source_name(name)
+        if parsed is None or cls.get_family(parsed[0]) is None:
+            return None
+        return parsed[0]
 
-    def get_gpu_usage_amd(self):
-        try:
-            if self.gpu is None:
-                return None
-            else:
-                return int(self.gpu.query_load()*100)
-        except Exception:
+    @classmethod
+    def get_range_metric(cls, name):
+        """The metric whose min/max values (e.g. cpu_min_temp) apply to a data source, None if unknown."""
+        metric = cls.get_base_metric(name)
+        if metric is None:
             return None
-        
-    def get_cpu_power(self):
+        family = cls.get_family(metric)
+        if family == "hwmon":
+            return hwmon.get_range_metric(metric)
+        return cls.RANGE_KEYS.get(family, family)
+
+    @classmethod
+    def is_data_source(cls, name):
+        """True for a metric or a source derived from its history, e.g. cpu_temp_avg10s, see history.py."""
+        return cls.get_base_metric(name) is not None
+
+    def get_interval(self, *metrics):
+        return min(self.intervals.get(metric, self.update_interval) for metric in metrics)
+
+    def get_job_interval(self, metrics):
+        """The interval of a job sampling metrics: the shortest of the ones in use, a paused metric does not count."""
+        active = metrics if self.active_families is None else [m for m in metrics if m in self.active_families]
+        return self.get_interval(*(active or metrics))
+
+    def set_intervals(self, update_interval, intervals=None):
+        """Set the default sampling interval, and the interval of some metrics, e.g. {"nvme_temp": 5}."""
+        self.update_interval = update_interval
+        self.intervals = dict(intervals or {})
+        self.update_intervals()
+
+    def update_intervals(self):
+        for name, metrics in self.job_metrics.items():
+            self.sampler.set_interval(name, self.get_job_interval(metrics))
+        for backend in self.backends:
+            if backend.name in self.job_metrics:
+                backend.set_interval(self.get_job_interval(self.job_metrics[backend.name]))
+
+    def set_active(self, sources=None):
+        """Only sample the metrics of the given data sources (every metric when None), e.g. the ones the displays use.
+
+        The derived sources among them are computed from now on.
+        """
+        with self.lock:
+            self.active_sources = sources
+            self.update_active(sources)
+
+    def update_active(self, sources):
+        if sources is None:
+            sources = self.METRICS_KEYS
+        metrics = set()
+        derived = {}
+        hwmon_sources = set()
+        nvme_sources = set()
+        for name in sources:
+            metric = self.get_base_metric(name)
+            if metric is None:
+                continue
+            metrics.add(self.get_family(metric))
+            if self.get_family(metric) == "hwmon":
+                hwmon_sources.add(metric)
+            elif self.get_family(metric).startswith("nvme_"):
+                nvme_sources.add(metric)
+            if name != metric:
+                value = self.history.add_source(name)
+                # Until the next sample, a source without history shows the current value
+                derived[name] = value if value is not None else self.sampler.snapshot.get(metric, 0)
+        # cpu_temp and nvme_temp too, when in use and read from hwmon
+        hwmon_sources.update(metric for metric in self.batch_metrics[self.hwmon] if metric in metrics and metric != "hwmon")
+        self.hwmon.set_sources(hwmon_sources)
+        self.nvme.set_sources(nvme_sources)
+        if derived:
+            self.sampler.publish(derived)
+        self.active_families = metrics
+        self.update_intervals()
+        active = {name for name, job_metrics in self.job_metrics.items() if not metrics.isdisjoint(job_metrics)}
+        self.sampler.set_active(active)
+
+    def record(self, function):
+        """Run a sampling function, add its values to the history with the derived sources."""
+        values = function()
+        if values:
+            values = self.history.record(time.monotonic(), values)
+        return values
+
+    def sample_metric(self, metric, function):
         try:
-            return int(self.cpu_power_reader.compute_power_all_cores(self.update_interval))
+            result = function()
+            return {metric: 0 if result is None else int(result)}
         except Exception as e:
-            print(f"Error getting CPU power: {e}")
+            print(f"Error getting {metric}: {e}")
             return None
 
-    def get_gpu_temp_amdgpuinfo(self):
+    def sample_batch(self, backend, metrics):
         try:
-            return self.gpu.query_temperature()
+            values = backend.sample() or {}
         except Exception as e:
-            print(f"Error getting AMD GPU temperature: {e}")
+            print(f"Error getting {', '.join(metrics)}: {e}")
             return None
-
-    def get_gpu_frequency_amdgpuinfo(self):
-        try:
-            # try common method names on pyamdgpuinfo GPU object
-            if self.gpu is None:
-                return None
-            for method in ('query_sclk','query_mclk'):
-                if hasattr(self.gpu, method):
-                    try:
-                        return int(getattr(self.gpu, method)()/10**6)
-                    except Exception:
-                        continue
-            # fallback: some versions provide a `query_clock` with a name
-            if hasattr(self.gpu, 'query_clock'):
+        sampled = {metric: 0 for metric in metrics if metric in self.METRICS_KEYS}
+        for name, value in values.items():
+            family = self.get_family(name)
+            if family in metrics:
                 try:
-                    return int(self.gpu.query_clock()/10**6)
-                except Exception:
-                    pass
-            return None
-        except Exception as e:
-            print(f"Error getting AMD GPU frequency: {e}")
-            return None
+                    # hwmon sensors keep their decimals, e.g. voltages
+                    sampled[name] = 0 if value is None else value if family == "hwmon" else int(value)
+                except (TypeError, ValueError, OverflowError) as e:
+                    print(f"Error getting {name}: {e}")
+        return sampled
+
+    def refresh(self):
+        """Take the last snapshot published by the sampler."""
+        snapshot = self.sampler.snapshot
+        if snapshot is not self.metrics:
+            self.metrics = snapshot
+            self.converted_metrics = {}
+
+    def next_refresh_in(self):
+        """Seconds until the sampler may publish new values."""
+        return self.sampler.next_update_in()
 
-    def get_gpu_power_amdgpuinfo(self):
-        try:
-            if self.gpu is None:
-                return None
-            for method in ('query_power','query_power_draw','query_power_watt'):
-                if hasattr(self.gpu, method):
-                    try:
-                        return int(getattr(self.gpu, method)())
-                    except Exception:
-                        continue
-            return None
-        except Exception as e:
-            print(f"Error getting AMD GPU power: {e}")
-            return None
+    def get_metrics(self, temp_unit):
+        """Get the last sampled metrics, with temperatures in the given units."""
+        key = (temp_unit["cpu"], temp_unit["gpu"])
+        metrics = self.converted_metrics.get(key)
+        if metrics is None:
+            metrics = dict(self.metrics)
+            for device in ["cpu", "gpu"]:
+                if temp_unit[device] == "fahrenheit":
+                    for name, value in metrics.items():
+                        if self.get_range_metric(name) == f"{device}_temp":
+                            converted = value * 9 / 5 + 32
+                            metrics[name] = int(converted) if isinstance(value, int) else converted
+            self.converted_metrics[key] = metrics
+        return metrics
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        self.sampler.stop()
+        for backend in self.backends:
+            backend.close()
+
+    def set_effective_frequency(self, effective):
+        """Measure the CPU frequencies from the APERF/MPERF counters, see cpufreq.py."""
+        self.cpufreq.set_effective(effective)
 
-    def get_nvme_metrics(self):
-        """Sample NVMe speed/util with delta."""
-        try:
-            now = time.time()
-            counters = psutil.disk_io_counters(perdisk=True).get(self.nvme_disk)
-            if counters and self.last_disk_io:
-                dt = now - self.last_time
-                read_mb_s = int((counters.read_bytes - self.last_disk_io.read_bytes) / (1024**2 * dt))
-                write_mb_s = int((counters.write_bytes - self.last_disk_io.write_bytes) / (1024**2 * dt))
-                util_pct = (counters.busy_time - self.last_disk_io.busy_time) / (dt * 10)
-                self.metrics['nvme_read_speed'] = max(0, read_mb_s)
-                self.metrics['nvme_write_speed'] = max(0, write_mb_s)
-                self.metrics['nvme_usage'] = min(100, util_pct)
-            self.last_disk_io = counters
-            self.last_time = now
-            return True
-        except Exception as e:
-            print(f"Error getting nvme and utils: {e}")
-            return False
+    def set_nvme_disk(self, nvme_disk):
+        if nvme_disk != self.nvme_disk:
+            self.nvme.set_disk(nvme_disk)
+        self.nvme_disk = nvme_disk
 
 def get_cpu_temp_psutils():
     try:
@@ -193,8 +360,7 @@ def get_cpu_temp_psutils():
         return None
 def get_cpu_temp_linux():
     try:
-        with open('/sys/class/thermal/thermal_zone0/temp', 'r') as f:
-            return float(f.read().strip()) / 1000.0
+        return sysfs.read_int('/sys/class/thermal/thermal_zone0/temp') / 1000.0
     except Exception:
         return None
 def get_cpu_temp_windows_wmi(): 
@@ -215,36 +381,11 @@ def get_cpu_temp_windows_wintmp():
     
 def get_cpu_temp_raspberry_pi():
     try:
-        output = subprocess.check_output(['vcgencmd', 'measure_temp']).decode()
+        output = subprocess.check_output(['vcgencmd', 'measure_temp'], timeout=2).decode()
         return float(re.search(r'temp=(\d+\.\d+)', output).group(1))
     except Exception:
         return None
 
-def get_gpu_temp_nvidia():
-    # Try NVIDIA GPU first
-    try:
-        # Try using pynvml library
-        try:
-            from pynvml import nvmlInit, nvmlDeviceGetCount, nvmlDeviceGetHandleByIndex, \
-                            nvmlDeviceGetTemperature, NVML_TEMPERATURE_GPU, nvmlShutdown
-            
-            nvmlInit()
-            device_count = nvmlDeviceGetCount()
-            
-            if device_count > 0:
-                handle = nvmlDeviceGetHandleByIndex(0)
-                temp = nvmlDeviceGetTemperature(handle, NVML_TEMPERATURE_GPU)
-                nvmlShutdown()
-                return temp
-            
-            nvmlShutdown()
-        except Exception:
-            # Try using nvidia-smi command
-            output = subprocess.check_output(['nvidia-smi', '--query-gpu=temperature.gpu', '--format=csv,noheader']).decode()
-            return float(output.strip().split('\n')[0])
-    except Exception:
-        return None
-
 def get_gpu_temp_wintemp():
     try:
         import WinTmp
@@ -260,32 +401,6 @@ def get_cpu_usage():
         print("Warning: Could not retrieve CPU usage.")
         return None
 
-def get_gpu_usage_nvidia_smi():
-    try: 
-        output = subprocess.check_output(
-            ['nvidia-smi', '--query-gpu=utilization.gpu',
-                '--format=csv,noheader']
-        ).decode().strip()
-        return int(output.split()[0])
-    except Exception:
-        return None
-    
-def get_gpu_usage_nvml():
-    try:
-        # NVIDIA GPUs using pynvml
-        from pynvml import (nvmlInit, nvmlShutdown,
-                        nvmlDeviceGetHandleByIndex,
-                        nvmlDeviceGetUtilizationRates)
-        nvmlInit()
-        try:
-            handle = nvmlDeviceGetHandleByIndex(0)
-            utilization = nvmlDeviceGetUtilizationRates(handle)
-            return int(utilization.gpu)
-        finally:
-            nvmlShutdown()
-    except Exception:
-        return None
-
 # New helper functions for frequency and power
 
 def get_cpu_frequency_psutil():
@@ -299,58 +414,19 @@ def get_cpu_frequency_psutil():
 def get_cpu_frequency_proc():
     try:
         # Fallback to reading /proc/cpuinfo first "cpu MHz" entry
-        with open('/proc/cpuinfo', 'r') as f:
-            for line in f:
-                if 'cpu MHz' in line:
-                    parts = line.split(':')
-                    if len(parts) > 1:
-                        return int(float(parts[1].strip()))
-    except Exception:
-        return None
-
-
-def get_gpu_frequency_nvml():
-    try:
-        from pynvml import (nvmlInit, nvmlDeviceGetHandleByIndex, nvmlDeviceGetClockInfo, nvmlShutdown, NVML_CLOCK_GRAPHICS)
-        nvmlInit()
-        try:
-            handle = nvmlDeviceGetHandleByIndex(0)
-            clk = nvmlDeviceGetClockInfo(handle, NVML_CLOCK_GRAPHICS)
-            return int(clk/10**6)
-        finally:
-            nvmlShutdown()
-    except Exception:
-        return None
-
-
-def get_gpu_frequency_nvidia_smi():
-    try:
-        output = subprocess.check_output(['nvidia-smi', '--query-gpu=clocks.gr', '--format=csv,noheader']).decode().strip()
-        # might return lines like "1500 MHz" or just numeric
-        val = output.split('\n')[0].strip()
-        return int(re.sub(r'[^0-9]', '', val))
+        for line in sysfs.read_text('/proc/cpuinfo').splitlines():
+            if 'cpu MHz' in line:
+                parts = line.split(':')
+                if len(parts) > 1:
+                    return int(float(parts[1].strip()))
     except Exception:
         return None
 
 
-def get_gpu_frequency_nvidia_smi_alt():
-    """Alternative NVIDIA GPU frequency retrieval.
-    Tries nvidia-smi with clocks.current.graphics (no units), then falls back to nvidia-settings query.
+def get_gpu_frequency_nvidia_settings():
+    """NVIDIA GPU frequency from nvidia-settings, for when nvidia-smi is not available.
     Returns MHz as int or None.
     """
-    try:
-        # Try a newer/query field that may return numeric value without units
-        output = subprocess.check_output([
-            'nvidia-smi',
-            '--query-gpu=clocks.current.graphics',
-            '--format=csv,noheader,nounits'
-        ], stderr=subprocess.DEVNULL, timeout=2).decode().strip()
-        if output:
-            val = output.split('\n')[0].strip()
-            return int(float(re.sub(r'[^0-9\.]', '', val)))
-    except Exception:
-        pass
-
     try:
         # Fallback to nvidia-settings (if available). Use -t for terse/raw output when supported.
         out = subprocess.check_output(['nvidia-settings', '-q', 'GPUCoreClock', '-t'], stderr=subprocess.DEVNULL, timeout=2).decode().strip()
@@ -363,45 +439,6 @@ def get_gpu_frequency_nvidia_smi_alt():
 
     return None
 
-def get_cpu_power_rapl():
-    try:
-        # Try reading intel-rapl energy_uj counters and compute instantaneous power
-        base = '/sys/class/powercap'
-        import glob
-        rapl_dirs = glob.glob(base + '/intel-rapl:*')
-        if not rapl_dirs:
-            return None
-        # pick first package
-        energy_file = None
-        for d in rapl_dirs:
-            cand = d + '/intel-rapl:0/energy_uj'
-            if os.path.exists(cand):
-                energy_file = cand
-                break
-        if energy_file is None:
-            # try package-0 path
-            for d in rapl_dirs:
-                cand = d + '/energy_uj'
-                if os.path.exists(cand):
-                    energy_file = cand
-                    break
-        if energy_file is None:
-            return None
-        # sample energy over short interval
-        with open(energy_file, 'r') as f:
-            e1 = int(f.read().strip())
-        import time
-        time.sleep(0.1)
-        with open(energy_file, 'r') as f:
-            e2 = int(f.read().strip())
-        # energy in microjoules over dt seconds => watts = (e2-e1)/1e6/dt
-        dt = 0.1
-        watt = (e2 - e1) / 1e6 / dt
-        return int(abs(watt))
-    except Exception:
-        return None
-
-
 def get_cpu_power_turbostat():
     """Try retrieving package power using turbostat command (may require root). Parse a 'PkgWatt' or similar entry.
     Returns watts as int or None.
@@ -422,79 +459,26 @@ def get_cpu_power_turbostat():
     return None
 
 
-def get_gpu_power_nvml():
-    try:
-        from pynvml import nvmlInit, nvmlDeviceGetHandleByIndex, nvmlDeviceGetPowerUsage, nvmlShutdown
-        nvmlInit()
-        try:
-            handle = nvmlDeviceGetHandleByIndex(0)
-            # returns milliwatts
-            mw = nvmlDeviceGetPowerUsage(handle)
-            return int(mw / 1000)
-        finally:
-            nvmlShutdown()
-    except Exception:
-        return None
-
-
-def get_gpu_power_nvidia_smi():
-    try:
-        output = subprocess.check_output(['nvidia-smi', '--query-gpu=power.draw', '--format=csv,noheader']).decode().strip()
-        val = output.split('\n')[0].strip()
-        return int(float(re.sub(r'[^0-9\.]', '', val)))
-    except Exception:
-        return None
+@lru_cache(maxsize=None)
+def find_drm_power_file():
+    """The hwmon power file of the first DRM card, None if it has none. Looked up once."""
+    for path in sorted(glob.glob('/sys/class/drm/card0/device/hwmon/hwmon*')):
+        for name in ('power1_average', 'power1_input'):
+            if os.path.exists(os.path.join(path, name)):
+                return os.path.join(path, name)
+    return None
 
-def get_gpu_power_nvidia_smi_alt():
-    """Alternative NVIDIA GPU power retrieval.
-    Tries nvidia-smi with nounits, falls back to standard nvidia-smi parsing, then attempts to read sysfs hwmon entries.
+def get_gpu_power_drm_sysfs():
+    """GPU power from the hwmon entries under the DRM device, read through a file kept open.
     Returns watts as int or None.
     """
+    path = find_drm_power_file()
+    if path is None:
+        return None
     try:
-        # Prefer nounits format to avoid unit parsing issues
-        output = subprocess.check_output(
-            ['nvidia-smi', '--query-gpu=power.draw', '--format=csv,noheader,nounits'],
-            stderr=subprocess.DEVNULL, timeout=2
-        ).decode().strip()
-        if output:
-            val = output.split('\n')[0].strip()
-            return int(float(re.sub(r'[^0-9\.]', '', val)))
-    except Exception:
-        pass
-
-    try:
-        # Fallback to standard nvidia-smi output (may include " W")
-        output = subprocess.check_output(
-            ['nvidia-smi', '--query-gpu=power.draw', '--format=csv,noheader'],
-            stderr=subprocess.DEVNULL, timeout=2
-        ).decode().strip()
-        if output:
-            val = output.split('\n')[0].strip()
-            return int(float(re.sub(r'[^0-9\.]', '', val)))
-    except Exception:
-        pass
-
-    try:
-        # Try reading possible sysfs hwmon entries under the DRM device for power information
-        base = '/sys/class/drm/card0/device'
-        if os.path.exists(base):
-            for root, dirs, files in os.walk(base):
-                for f in files:
-                    if 'power' in f or 'power1_input' in f:
-                        try:
-                            with open(os.path.join(root, f), 'r') as fh:
-                                txt = fh.read().strip()
-                                if txt:
-                                    # Some entries may be in microwatts or watts; attempt sensible int parse
-                                    val = re.sub(r'[^0-9\.]', '', txt)
-                                    if val:
-                                        return int(float(val))
-                        except Exception:
-                            continue
+        return int(sysfs.read_int(path) / 1000000)  # microwatts
     except Exception:
-        pass
-
-    return None
+        return None
 
 def get_amd_cpu_power():
     try:
@@ -0,0 +1,182 @@
+"""NVIDIA GPU metrics.
+
+NvmlBackend keeps one NVML session open for the lifetime of the process, with the
+device handles cached, and reads temperature, utilization, graphics clock and power of
+every GPU in one pass. The session is only reinitialized after an NVML error, at most every
+RETRY_INTERVAL seconds.
+
+NvidiaSmiBackend is used when pynvml is missing: a single nvidia-smi child started
+with -lms prints the four readings of every GPU at the sampling interval, and its
+output is parsed as a stream. Until the first line arrives, or if the child cannot be
+kept running, one batched nvidia-smi query is run per sample instead.
+
+Both give gpu_<metric> for the first GPU, gpu<N>_<metric> and gpu_max_<metric>.
+"""
+import subprocess
+import threading
+import time
+
+from sampler import GpuBackend, get_indexed_values
+
+
+RETRY_INTERVAL = 5  # seconds between two attempts to open NVML or start nvidia-smi
+
+
+class NvmlBackend(GpuBackend):
+    name = "nvml"
+
+    def __init__(self):
+        self.nvml = None
+        self.handles = None
+        self.retry_time = 0
+
+    def open(self):
+        import pynvml
+        pynvml.nvmlInit()
+        self.nvml = pynvml
+        self.handles = [pynvml.nvmlDeviceGetHandleByIndex(index) for index in range(pynvml.nvmlDeviceGetCount())]
+
+    def close(self):
+        nvml, self.nvml, self.handles = self.nvml, None, None
+        if nvml is not None:
+            try:
+                nvml.nvmlShutdown()
+            except Exception:
+                pass
+
+    def read(self, name, query):
+        """Run one NVML query, None if the GPU does not support it. Other errors close the session."""
+        try:
+            return query()
+        except self.nvml.NVMLError as e:
+            if getattr(e, 'value', None) == self.nvml.NVML_ERROR_NOT_SUPPORTED:
+                return None
+            print(f"Error getting {name} from NVML: {e}")
+            self.close()
+            self.retry_time = time.monotonic() + RETRY_INTERVAL
+            raise
+
+    def read_gpu(self, handle):
+        nvml = self.nvml
+        values = {}
+        values['temp'] = self.read('gpu_temp', lambda: nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU))
+        usage = self.read('gpu_usage', lambda: nvml.nvmlDeviceGetUtilizationRates(handle))
+        values['usage'] = usage.gpu if usage is not None else None
+        values['frequency'] = self.read('gpu_frequency', lambda: nvml.nvmlDeviceGetClockInfo(handle, nvml.NVML_CLOCK_GRAPHICS))
+        power = self.read('gpu_power', lambda: nvml.nvmlDeviceGetPowerUsage(handle))  # milliwatts
+        values['power'] = power / 1000 if power is not None else None
+        return values
+
+    def sample(self):
+        if self.handles is None:
+            if time.monotonic() < self.retry_time:
+                return {}
+            try:
+                self.open()
+            except Exception:
+                self.close()
+                self.retry_time = time.monotonic() + RETRY_INTERVAL
+                return {}
+        gpus = {}
+        try:
+            for index, handle in enumerate(self.handles):
+                gpus[index] = self.read_gpu(handle)
+        except Exception:
+            pass  # the session is closed, return what was read
+        return get_indexed_values("gpu", gpus)
+
+
+SMI_FIELDS = ('temp', 'usage', 'frequency', 'power')
+SMI_QUERY = "--query-gpu=index,temperature.gpu,utilization.gpu,clocks.gr,power.draw"
+SMI_TIMEOUT = 2  # seconds
+
+
+def parse_smi_line(line):
+    """Parse one line of nvidia-smi csv,noheader,nounits output into (index, values)."""
+    parts = [part.strip() for part in line.split(',')]
+    if len(parts) != len(SMI_FIELDS) + 1:
+        return None, None
+    try:
+        index = int(parts[0])
+    except ValueError:
+        return None, None
+    values = {}
+    for metric, text in zip(SMI_FIELDS, parts[1:]):
+        try:
+            values[metric] = float(text)
+        except ValueError:
+            values[metric] = None  # "[N/A]", "[Not Supported]"
+    return index, values
+
+
+class NvidiaSmiBackend(GpuBackend):
+    name = "nvidia_smi"
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.process = None
+        self.reader = None
+        self.gpus = {}  # GPU index -> last values, replaced (never mutated) by the reader thread
+        self.retry_time = 0
+
+    def query(self):
+        """Run one batched nvidia-smi query for every GPU."""
+        output = subprocess.check_output(
+            ['nvidia-smi', SMI_QUERY, '--format=csv,noheader,nounits'],
+            stderr=subprocess.DEVNULL, timeout=SMI_TIMEOUT
+        ).decode()
+        gpus = {}
+        for line in output.splitlines():
+            index, values = parse_smi_line(line)
+            if index is not None:
+                gpus[index] = values
+        return gpus
+
+    def start_stream(self):
+        interval_ms = max(100, int(self.interval * 1000))
+        self.process = subprocess.Popen(
+            ['nvidia-smi', SMI_QUERY, '--format=csv,noheader,nounits', '-lms', str(interval_ms)],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1
+        )
+        self.reader = threading.Thread(target=self.read_stream, args=(self.process,), name="nvidia-smi-stream", daemon=True)
+        self.reader.start()
+
+    def read_stream(self, process):
+        for line in process.stdout:
+            index, values = parse_smi_line(line)
+            if index is not None and process is self.process:
+                self.gpus = {**self.gpus, index: values}
+
+    def stop_stream(self):
+        process, self.process = self.process, None
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.gpus = {}
+
+    def sample(self):
+        if self.process is not None and self.process.poll() is not None:
+            print("Warning: the nvidia-smi stream stopped, querying nvidia-smi at each sample.")
+            self.stop_stream()
+            self.retry_time = time.monotonic() + RETRY_INTERVAL
+        if self.process is None and time.monotonic() >= self.retry_time:
+            try:
+                self.start_stream()
+            except Exception:
+                self.retry_time = time.monotonic() + RETRY_INTERVAL
+        gpus = self.gpus
+        if not gpus:
+            gpus = self.query()
+        return get_indexed_values("gpu", gpus)
+
+    def set_interval(self, interval):
+        if interval != self.interval:
+            self.interval = interval
+            if self.process is not None:
+                self.stop_stream()  # restarted at the new interval by the next sample()
+
+    def close(self):
+        self.stop_stream()
@@ -0,0 +1,148 @@
+"""NVMe drive metrics.
+
+NvmeBackend reads the temperature (hwmon Composite sensor) of every NVMe controller
+and the I/O counters (see blockstat) of the first namespace of each, and of the
+configured disk, in one pass. It gives nvme<N>_<metric> for the drive nvmeN,
+nvme_max_<metric>, and nvme_<metric> for the configured disk ("nvme_disk" in
+config.json, which can also be a non-NVMe disk such as sda). Only the files of the
+drives whose data sources are in use are read, see set_sources().
+Speeds are in MB/s, usage in percent of the time the disk was busy.
+"""
+import glob
+import os
+import re
+
+from blockstat import BlockStat, list_devices
+from sampler import BatchedBackend, get_indexed_values
+from sysfs import SysfsFile
+
+
+NVME_CLASS_PATH = "/sys/class/nvme"
+DISK_PATTERN = re.compile(r"^nvme(\d+)n(\d+)$")
+SOURCE_PATTERN = re.compile(r"^nvme(?:(?P<index>\d+)|(?P<max>_max))?_(?P<metric>[a-z_]+)$")
+
+
+def find_temperature_files(base_path=NVME_CLASS_PATH):
+    """{controller index: temp1_input SysfsFile}"""
+    files = {}
+    for path in glob.glob(os.path.join(base_path, "nvme[0-9]*")):
+        match = re.search(r"nvme(\d+)$", path)
+        if match is None:
+            continue
+        candidates = sorted(glob.glob(os.path.join(path, "hwmon*", "temp1_input"))
+                            + glob.glob(os.path.join(path, "device", "hwmon", "hwmon*", "temp1_input")))
+        if candidates:
+            files[int(match.group(1))] = SysfsFile(candidates[0])
+    return files
+
+
+def find_disks():
+    """{controller index: BlockStat}, of the first namespace of each NVMe controller."""
+    disks = {}
+    for name in list_devices(DISK_PATTERN):
+        disks.setdefault(int(DISK_PATTERN.match(name).group(1)), BlockStat(name))
+    return disks
+
+
+class NvmeBackend(BatchedBackend):
+    name = "nvme"
+
+    def __init__(self, disk="nvme0n1"):
+        self.temperature_files = find_temperature_files()
+        self.disks = find_disks()
+        self.disk_stat = None
+        self.sources = None  # {"temp": indexes, "io": indexes} to read, None for every drive, see set_sources()
+        self.set_disk(disk)
+        try:
+            self.sample()  # first counters, the next sample gives the speeds
+        except Exception:
+            pass
+
+    def set_disk(self, disk):
+        """Give the nvme_<metric> values of disk from now on."""
+        self.disk = disk
+        match = DISK_PATTERN.match(disk)
+        self.primary = int(match.group(1)) if match else None
+        if self.disk_stat is not None:
+            self.disk_stat.close()
+        # A disk that is not the first namespace of a controller (e.g. sda) is read apart
+        primary_disk = self.disks.get(self.primary)
+        self.disk_stat = None if primary_disk is not None and primary_disk.device == disk else BlockStat(disk)
+
+    def set_sources(self, names):
+        """Only read the drives of the given nvme data sources from now on, e.g. nvme1_temp or nvme_max_usage.
+
+        The indexes are kept with None for the configured disk, which set_disk() can change.
+        """
+        sources = {"temp": set(), "io": set()}
+        for name in names:
+            match = SOURCE_PATTERN.match(name)
+            if match is None:
+                continue
+            if match["max"]:
+                indexes = set(self.temperature_files) | set(self.disks)
+            else:
+                indexes = {int(match["index"]) if match["index"] is not None else None}
+            sources["temp" if match["metric"] == "temp" else "io"].update(indexes)
+        self.sources = sources
+        for index, disk in self.disks.items():
+            if not self.is_read(index, "io"):
+                disk.close()  # the speeds are measured again from the next sample
+        for index, temperature_file in self.temperature_files.items():
+            if not self.is_read(index, "temp"):
+                temperature_file.close()
+        if self.disk_stat is not None and not self.is_read(None, "io"):
+            self.disk_stat.close()
+
+    def is_read(self, index, kind):
+        if self.sources is None:
+            return True
+        indexes = self.sources[kind]
+        return index in indexes or (index == self.primary and None in indexes)
+
+    def sample(self):
+        devices = {}
+        for index, temperature_file in self.temperature_files.items():
+            if not self.is_read(index, "temp"):
+                continue
+            try:
+                devices[index] = {'temp': temperature_file.read_int() / 1000}
+            except (OSError, ValueError):
+                continue
+        for index, disk in self.disks.items():
+            if not self.is_read(index, "io"):
+                continue
+            try:
+                io = disk.sample()
+            except (OSError, ValueError, IndexError):
+                continue
+            if io is not None:
+                devices.setdefault(index, {}).update(io)
+        values = get_indexed_values("nvme", devices, self.primary)
+        if self.disk_stat is not None and self.is_read(None, "io"):
+            try:
+                io = self.disk_stat.sample()
+            except (OSError, ValueError, IndexError):
+                io = None
+            if io is not None:
+                values.update((f"nvme_{metric}", value) for metric, value in io.items())
+        return values
+
+    def close(self):
+        for disk in list(self.disks.values()) + [self.disk_stat]:
+            if disk is not None:
+                disk.close()  # the speeds are measured from the next sample
+        for temperature_file in self.temperature_files.values():
+            temperature_file.close()  # reopened by the next sample
+
+    def get_nvme_temp(self):
+        return self.sample().get('nvme_temp')
+
+    def get_nvme_read_speed(self):
+        return self.sample().get('nvme_read_speed')
+
+    def get_nvme_write_speed(self):
+        return self.sample().get('nvme_write_speed')
+
+    def get_nvme_usage(self):
+        return self.sample().get('nvme_usage')
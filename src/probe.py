@@ -0,0 +1,143 @@
+"""Choose the function used to read each metric.
+
+The candidates of every metric are probed in parallel, in daemon threads, and a
+probe that does not answer within PROBE_TIMEOUT seconds counts as failed. The first
+candidate (in the order given) that returns a value wins. Functions bound to the same
+object (e.g. the methods of one backend) are probed one after another, never
+concurrently.
+
+The winners are cached per host and kernel in CACHE_PATH, so that a restart only
+checks the cached functions before the first frame. The other metrics (no function
+worked, or the cached one stopped working) are returned to be probed again later, in
+the background, since a driver may only have been loaded or a permission fixed since
+the last run. Failures are never cached.
+"""
+import json
+import os
+import platform
+import threading
+import time
+
+
+PROBE_TIMEOUT = 3  # seconds
+CACHE_PATH = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser("~"), ".cache"),
+    "digital_thermal_right_lcd", "probe_cache.json"
+)
+
+
+def get_host_key():
+    return f"{platform.node()}-{platform.release()}"
+
+
+def get_function_name(function):
+    owner = getattr(function, '__self__', None)
+    if owner is None:
+        return function.__name__
+    return f"{getattr(owner, 'name', None) or type(owner).__name__}.{function.__name__}"
+
+
+def load_cache(path):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(path, cache):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(cache, f, indent=4)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"Warning: could not save the probe cache {path}: {e}")
+
+
+def probe(function):
+    try:
+        return function()
+    except Exception:
+        return None
+
+
+def probe_candidates(candidates, timeout=PROBE_TIMEOUT):
+    """Probe {metric: [functions]} in parallel, return {metric: (function, value)} for the metrics that work."""
+    groups = {}  # owner -> functions to probe one after another
+    for functions in candidates.values():
+        for function in functions:
+            group = groups.setdefault(getattr(function, '__self__', function), [])
+            if function not in group:
+                group.append(function)
+    results = {}
+    condition = threading.Condition()
+
+    def run(functions):
+        for function in functions:
+            value = probe(function)
+            with condition:
+                results[function] = value
+                condition.notify_all()
+
+    def select(timed_out):
+        """The winners, or None while a candidate that could still win is running."""
+        selected = {}
+        for metric, functions in candidates.items():
+            for function in functions:
+                if function not in results:
+                    if timed_out:
+                        continue
+                    return None
+                if results[function] is not None:
+                    selected[metric] = (function, results[function])
+                    break
+        return selected
+
+    for owner, functions in groups.items():
+        threading.Thread(target=run, args=(functions,), name="probe", daemon=True).start()
+    deadline = time.monotonic() + timeout
+    with condition:
+        selected = select(False)
+        while selected is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return select(True)
+            condition.wait(remaining)
+            selected = select(False)
+    return selected
+
+
+def remember_functions(selected, cache_path=CACHE_PATH):
+    """Add the winners {metric: (function, value)} to the cache of this host."""
+    if not cache_path or not selected:
+        return
+    cache = load_cache(cache_path)
+    host_key = get_host_key()
+    cached = {metric: name for metric, name in cache.get(host_key, {}).items() if name is not None}
+    names = dict(cached, **{metric: get_function_name(function) for metric, (function, value) in selected.items()})
+    if names != cache.get(host_key):
+        cache[host_key] = names
+        save_cache(cache_path, cache)
+
+
+def choose_functions(candidates, cache_path=CACHE_PATH, timeout=PROBE_TIMEOUT):
+    """Return ({metric: (function, first value)}, {metric: functions left to probe later}).
+
+    Without a cache for this host every candidate is probed now and nothing is left.
+    """
+    cache = load_cache(cache_path) if cache_path else {}
+    cached = cache.get(get_host_key())
+    if not cached:
+        selected = probe_candidates(candidates, timeout)
+        remember_functions(selected, cache_path)
+        return selected, {}
+    names = {metric: {get_function_name(function): function for function in functions}
+             for metric, functions in candidates.items()}
+    cached_candidates = {
+        metric: [names[metric][cached[metric]]] for metric in candidates if cached.get(metric) in names[metric]
+    }
+    selected = probe_candidates(cached_candidates, timeout) if cached_candidates else {}
+    left = {metric: functions for metric, functions in candidates.items() if metric not in selected}
+    return selected, left
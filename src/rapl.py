@@ -0,0 +1,124 @@
+"""CPU power from the RAPL energy counters of the powercap interface.
+
+Every zone (intel-rapl:<package>[:<subzone>], amd-rapl:...) is read at each sample
+and the power is the energy delta since the previous sample divided by the elapsed
+time, so nothing sleeps. Counters wrap at the zone's max_energy_range_uj. Zones are
+grouped by domain (package, core, dram) and summed over every package/socket.
+"""
+import os
+import re
+import time
+
+from sampler import BatchedBackend
+from sysfs import SysfsFile
+
+
+POWERCAP_PATH = "/sys/class/powercap"
+ZONE_PATTERN = re.compile(r"^(intel|amd)-rapl(:\d+)+$")  # not intel-rapl-mmio, which duplicates the packages
+DOMAIN_METRICS = {
+    "package": "cpu_package_power",
+    "core": "cpu_core_power",
+    "dram": "cpu_dram_power",
+}
+DEFAULT_ENERGY_RANGE = 2**32  # microjoules, when max_energy_range_uj cannot be read
+
+
+class RaplZone:
+    def __init__(self, path, domain):
+        self.path = path
+        self.domain = domain
+        self.energy_file = SysfsFile(os.path.join(path, "energy_uj"))
+        try:
+            with open(os.path.join(path, "max_energy_range_uj")) as f:
+                self.max_energy_range = int(f.read())
+        except (OSError, ValueError):
+            self.max_energy_range = DEFAULT_ENERGY_RANGE
+        self.last_energy = None
+        self.last_time = None
+
+    def read_energy(self):
+        return self.energy_file.read_int()
+
+    def get_power(self):
+        """Watts since the previous call, None on the first call."""
+        now = time.monotonic()
+        energy = self.read_energy()
+        last_energy, last_time = self.last_energy, self.last_time
+        self.last_energy, self.last_time = energy, now
+        if last_energy is None or now <= last_time:
+            return None
+        delta = energy - last_energy
+        if delta < 0:
+            delta += self.max_energy_range  # counter wrapped
+        return delta / 1_000_000 / (now - last_time)
+
+
+def get_domain(zone_path):
+    try:
+        with open(os.path.join(zone_path, "name")) as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    if name.startswith("package"):
+        return "package"
+    return name if name in DOMAIN_METRICS else None  # psys and uncore are not summed
+
+
+def find_zones(base_path=POWERCAP_PATH):
+    """Readable RAPL zones of every package, by domain."""
+    zones = []
+    try:
+        entries = sorted(os.listdir(base_path))
+    except OSError:
+        return zones
+    for entry in entries:
+        if not ZONE_PATTERN.match(entry):
+            continue
+        path = os.path.join(base_path, entry)
+        domain = get_domain(path)
+        if domain is None:
+            continue
+        zone = RaplZone(path, domain)
+        try:
+            zone.get_power()  # first reading, the next one gives a power
+        except OSError:
+            continue  # energy_uj is root only on most recent kernels, see the README
+        zones.append(zone)
+    return zones
+
+
+class RaplBackend(BatchedBackend):
+    name = "rapl"
+
+    def __init__(self, base_path=POWERCAP_PATH):
+        self.zones = find_zones(base_path)
+
+    def sample(self):
+        power = {}
+        for zone in self.zones:
+            try:
+                zone_power = zone.get_power()
+            except OSError:
+                continue
+            if zone_power is not None:
+                power[zone.domain] = power.get(zone.domain, 0) + zone_power
+        values = {metric: power.get(domain) for domain, metric in DOMAIN_METRICS.items()}
+        values["cpu_power"] = values["cpu_package_power"]
+        return values
+
+    def close(self):
+        for zone in self.zones:
+            zone.last_energy = None  # the next power is measured from the next sample
+            zone.energy_file.close()  # reopened by the next sample
+
+    def get_cpu_power(self):
+        return self.sample().get("cpu_power")
+
+    def get_cpu_package_power(self):
+        return self.sample().get("cpu_package_power")
+
+    def get_cpu_core_power(self):
+        return self.sample().get("cpu_core_power")
+
+    def get_cpu_dram_power(self):
+        return self.sample().get("cpu_dram_power")
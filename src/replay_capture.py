@@ -0,0 +1,95 @@
+"""Replay a frame capture to a device or a stand-in, or print its statistics.
+
+Usage:
+    python3 src/replay_capture.py capture.bin --stats
+    python3 src/replay_capture.py capture.bin --backend hid --speed 1
+    python3 src/replay_capture.py capture.bin --backend null --speed 0 --device 1
+
+Captures are recorded by the controller when "capture_file" is set in config.json or
+DIGITAL_LCD_CAPTURE in the environment (see capture.py for the format). Frames are sent
+at their original pace divided by --speed, 0 sends them as fast as possible.
+"""
+import argparse
+import time
+
+from capture import read_capture
+from hid_backends import get_backend
+
+
+def print_stats(path):
+    devices = {}
+    for timestamp, device_id, reports in read_capture(path):
+        stats = devices.setdefault(device_id, {"frames": 0, "reports": 0, "bytes": 0, "first": timestamp, "last": timestamp})
+        stats["frames"] += 1
+        stats["reports"] += len(reports)
+        stats["bytes"] += sum(len(report) for report in reports)
+        stats["last"] = timestamp
+    if not devices:
+        print("Empty capture.")
+    for device_id, stats in sorted(devices.items()):
+        duration = stats["last"] - stats["first"]
+        rate = (stats["frames"] - 1) / duration if duration > 0 else 0
+        bandwidth = stats["bytes"] / duration if duration > 0 else 0
+        print(f"device {device_id}: {stats['frames']} frames, {stats['reports']} reports, {stats['bytes']} bytes "
+              f"over {duration:.1f} s, {rate:.2f} frames/s, {bandwidth:.0f} B/s")
+
+
+def replay(path, backend, vendor_id, product_id, speed, report_gap, device_filter):
+    device_paths = [info['path'] for info in backend.enumerate(vendor_id, product_id)]
+    devices = {}
+    start_wall = time.monotonic()
+    start_capture = None
+    frames = 0
+    for timestamp, device_id, reports in read_capture(path):
+        if device_filter is not None and device_id != device_filter:
+            continue
+        if start_capture is None:
+            start_capture = timestamp
+        if speed > 0:
+            delay = (timestamp - start_capture) / speed - (time.monotonic() - start_wall)
+            if delay > 0:
+                time.sleep(delay)
+        if device_id not in devices:
+            # Captured devices are matched, in order, to the devices found by the backend
+            index = device_id if device_filter is None else 0
+            if index >= len(device_paths):
+                print(f"Warning: no device to replay device {device_id}, skipping its frames.")
+                devices[device_id] = None
+            else:
+                devices[device_id] = backend.open(device_paths[index], vendor_id, product_id)
+        dev = devices[device_id]
+        if dev is None:
+            continue
+        for report in reports:
+            dev.write(report)
+            if report_gap:
+                time.sleep(report_gap)
+        frames += 1
+    for dev in devices.values():
+        if dev is not None:
+            dev.close()
+    print(f"Replayed {frames} frames in {time.monotonic() - start_wall:.1f} s.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a frame capture recorded by the controller.")
+    parser.add_argument("capture", help="capture file")
+    parser.add_argument("--stats", action="store_true", help="print frame rate and bandwidth per device and exit")
+    parser.add_argument("--backend", default="hid", help="device backend, see hid_backends (e.g. null, file:/tmp/out)")
+    parser.add_argument("--vendor-id", default="0x0416")
+    parser.add_argument("--product-id", default="0x8001")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor, 0 for as fast as possible")
+    parser.add_argument("--report-gap", type=float, default=0.007, help="delay after each report, in seconds")
+    parser.add_argument("--device", type=int, default=None, help="only replay this captured device id")
+    args = parser.parse_args()
+
+    if args.stats:
+        print_stats(args.capture)
+        return 0
+    replay(args.capture, get_backend(args.backend), int(args.vendor_id, 16), int(args.product_id, 16),
+           args.speed, args.report_gap, args.device)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,174 @@
+"""Sample the metrics in background threads.
+
+Each job (a function returning a dict of metric values) runs in its own thread at its
+own interval, so a slow backend (e.g. a subprocess) only delays its own metrics and
+never the rendering. After each run the job publishes a new snapshot: an immutable
+mapping of every metric, swapped in one assignment. Readers take self.snapshot without
+locking; only the writers are serialized.
+"""
+import threading
+import time
+from types import MappingProxyType
+
+
+class SamplerJob(threading.Thread):
+    """Run a sampling function every interval seconds and publish its results."""
+
+    def __init__(self, name, function, interval, sampler, on_pause=None):
+        super().__init__(name=f"sampler-{name}", daemon=True)
+        self.function = function
+        self.on_pause = on_pause  # called in the job thread when it is paused
+        self.interval = interval
+        self.sampler = sampler
+        self.next_run = time.monotonic()
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.active = True
+        self.runs = 0
+        self.last_duration = 0
+
+    def set_interval(self, interval):
+        if interval != self.interval:
+            self.interval = interval
+            self.next_run = min(self.next_run, time.monotonic() + interval)
+            self.wakeup.set()
+
+    def set_active(self, active):
+        """Pause or resume the job, a resumed job samples at once."""
+        if active != self.active:
+            self.active = active
+            self.next_run = time.monotonic()
+            self.wakeup.set()
+
+    def run(self):
+        while not self.stopped:
+            if not self.active:
+                if self.on_pause is not None:
+                    self.on_pause()
+                self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+            delay = self.next_run - time.monotonic()
+            if delay > 0:
+                self.wakeup.wait(delay)
+                self.wakeup.clear()
+                continue
+            start = time.monotonic()
+            try:
+                values = self.function()
+            except Exception as e:
+                # A failed run is skipped, the job keeps running at its interval
+                print(f"Error in sampler job {self.name}: {e}")
+                values = None
+            self.last_duration = time.monotonic() - start
+            self.runs += 1
+            # Next run on the interval grid, skipping the runs that a slow sample overran
+            self.next_run = max(self.next_run + self.interval, time.monotonic())
+            if values:
+                self.sampler.publish(values)
+
+    def stop(self):
+        self.stopped = True
+        self.wakeup.set()
+
+
+class MetricsSampler:
+    """Background sampling of the metrics, see the module docstring."""
+
+    def __init__(self, initial_values=None):
+        self.jobs = {}
+        self.snapshot = MappingProxyType(dict(initial_values or {}))
+        self.version = 0  # incremented at each published snapshot
+        self.lock = threading.Lock()
+
+    def add_job(self, name, function, interval, on_pause=None):
+        job = SamplerJob(name, function, interval, self, on_pause)
+        # Replaced rather than updated, jobs can be added while other threads iterate over them
+        self.jobs = {**self.jobs, name: job}
+        job.start()
+        return job
+
+    def set_interval(self, name, interval):
+        self.jobs[name].set_interval(interval)
+
+    def set_active(self, names):
+        """Only run the given jobs, the others are paused."""
+        for name, job in self.jobs.items():
+            job.set_active(name in names)
+
+    def publish(self, values):
+        with self.lock:
+            snapshot = dict(self.snapshot)
+            snapshot.update(values)
+            self.snapshot = MappingProxyType(snapshot)
+            self.version += 1
+
+    def next_update_in(self):
+        """Seconds until the next job is due, i.e. until the snapshot may change."""
+        now = time.monotonic()
+        return max(0, min((job.next_run - now for job in self.jobs.values() if job.active), default=float('inf')))
+
+    def stop(self):
+        for job in self.jobs.values():
+            job.stop()
+        for job in self.jobs.values():
+            job.join()
+        self.jobs = {}
+
+
+class BatchedBackend:
+    """A source that reads several metrics in one pass.
+
+    Its get_<metric>() methods are candidates for the metrics, like the plain functions
+    of metrics.py; the metrics that end up reading from the same backend are sampled by
+    a single job that calls sample() once per run.
+    """
+
+    name = None
+
+    def sample(self):
+        """Return {metric: value} for every metric the backend reads, None when unavailable."""
+        raise NotImplementedError
+
+    def set_interval(self, interval):
+        """Called with the interval of the sampler job reading the backend."""
+
+    def close(self):
+        pass
+
+
+class GpuBackend(BatchedBackend):
+    """The metric candidates shared by the GPU backends, whose sample() gives get_indexed_values("gpu", ...)."""
+
+    def get_gpu_temp(self):
+        return self.sample().get('gpu_temp')
+
+    def get_gpu_usage(self):
+        return self.sample().get('gpu_usage')
+
+    def get_gpu_frequency(self):
+        return self.sample().get('gpu_frequency')
+
+    def get_gpu_power(self):
+        return self.sample().get('gpu_power')
+
+
+def get_indexed_values(device, devices, primary=None):
+    """The data sources of several devices of the same kind.
+
+    devices is {index: {metric: value}}, e.g. {1: {"temp": 45}} for device "gpu". The
+    result has <device><index>_<metric> for every device, <device>_max_<metric> over
+    them, and <device>_<metric> for the primary device (the first one by default).
+    """
+    if primary is None or primary not in devices:
+        primary = min(devices, default=None)
+    values = {}
+    for index, device_values in devices.items():
+        for metric, value in device_values.items():
+            values[f"{device}{index}_{metric}"] = value
+            if index == primary:
+                values[f"{device}_{metric}"] = value
+            if value is not None:
+                key = f"{device}_max_{metric}"
+                values[key] = value if values.get(key) is None else max(values[key], value)
+    return values
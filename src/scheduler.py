@@ -0,0 +1,68 @@
+import math
+import time
+
+
+EARLY_WAKEUP_TOLERANCE = 0.001  # seconds
+
+
+class FixedRateScheduler:
+    """Run a loop at a fixed rate, on time.monotonic() deadlines.
+
+    The time spent working between two calls to wait() is taken out of the sleep, so
+    the period does not drift. When the work overruns one or more deadlines, the missed
+    ticks are skipped (the next deadline is the next one in the future) instead of
+    being run back to back to catch up.
+    wait() can also be asked to skip ticks on purpose when nothing will change before a
+    given delay; the deadlines stay on the same grid.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.start = time.monotonic()
+        self.deadline = self.start + interval
+        self.ticks = 0
+        self.overruns = 0  # ticks that started late because the work took too long
+        self.missed_ticks = 0  # deadlines skipped entirely
+        self.idle_ticks = 0  # deadlines skipped on purpose, see wait()
+
+    def elapsed(self):
+        """Seconds since the scheduler started, on the monotonic clock."""
+        return time.monotonic() - self.start
+
+    def set_interval(self, interval):
+        if interval != self.interval:
+            self.interval = interval
+            self.reset()
+
+    def reset(self):
+        """Restart the deadlines from now, e.g. after a pause that should not count as an overrun."""
+        self.deadline = time.monotonic() + self.interval
+
+    def wait(self, delay=0, sleep=time.sleep):
+        """Sleep until the next deadline, or return at once if it already passed.
+
+        With a delay, the deadlines before now + delay are skipped. sleep may return early
+        (e.g. ConfigWatcher.wait on a config change), the deadline is then kept for the
+        next call.
+        """
+        now = time.monotonic()
+        if now >= self.deadline:
+            # An overrun, counted before any skip on purpose moves the deadline past now
+            missed = int((now - self.deadline) // self.interval)
+            self.overruns += 1
+            self.missed_ticks += missed
+            self.deadline += (missed + 1) * self.interval
+            if delay <= 0:
+                self.ticks += 1
+                return
+        deadline = self.deadline
+        skipped = 0
+        if delay > 0 and now + delay > deadline:
+            skipped = math.ceil((now + delay - deadline) / self.interval)
+            deadline += skipped * self.interval
+        sleep(deadline - now)
+        if time.monotonic() < deadline - EARLY_WAKEUP_TOLERANCE:
+            return
+        self.idle_ticks += skipped
+        self.deadline = deadline + self.interval
+        self.ticks += 1
@@ -0,0 +1,95 @@
+"""Read sysfs and procfs files through file descriptors kept open.
+
+A SysfsFile opens its file once and rereads it with os.preadv() at offset 0 into a
+buffer it reuses: one system call per read instead of open, read, read (EOF) and
+close. sysfs and procfs generate the content again at each read from offset 0. When
+the device behind the file goes away (ESTALE, ENODEV, e.g. a GPU or a drive that is
+unplugged and plugged back), the file is reopened once before the error is raised.
+
+read_int(path) and read_text(path) keep one SysfsFile per path, for the functions
+that read a fixed file at each sample.
+"""
+import errno
+import os
+import threading
+
+
+BUFFER_SIZE = 4096  # grows when a file is larger, e.g. /proc/stat on many cores
+REOPEN_ERRORS = (errno.ESTALE, errno.ENODEV)
+
+
+class SysfsFile:
+    def __init__(self, path, size=BUFFER_SIZE):
+        self.path = path
+        self.fd = None
+        self.buffer = bytearray(size)
+        # The buffer is shared by the threads reading the file, and a file closed by another
+        # thread must not be read (its fd number could already belong to another file)
+        self.lock = threading.RLock()
+
+    def open(self):
+        self.fd = os.open(self.path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0))
+
+    def close(self):
+        with self.lock:
+            if self.fd is not None:
+                fd, self.fd = self.fd, None
+                os.close(fd)
+
+    def read_into_buffer(self):
+        """Read the whole file into self.buffer, return its size."""
+        if self.fd is None:
+            self.open()
+        if not hasattr(os, "preadv"):  # not on Windows
+            os.lseek(self.fd, 0, os.SEEK_SET)
+            data = os.read(self.fd, len(self.buffer))
+            self.buffer[:len(data)] = data
+            size = len(data)
+        else:
+            size = os.preadv(self.fd, [self.buffer], 0)
+        if size == len(self.buffer):
+            self.buffer = bytearray(2 * len(self.buffer))  # maybe truncated, read again
+            return self.read_into_buffer()
+        return size
+
+    def read_bytes(self):
+        with self.lock:
+            try:
+                size = self.read_into_buffer()
+            except OSError as e:
+                if e.errno not in REOPEN_ERRORS or self.fd is None:
+                    raise
+                self.close()
+                size = self.read_into_buffer()
+            return bytes(memoryview(self.buffer)[:size])
+
+    def read_text(self):
+        return self.read_bytes().decode()
+
+    def read_int(self):
+        return int(self.read_bytes())
+
+    def __del__(self):
+        try:
+            self.close()
+        except OSError:
+            pass
+
+
+_files = {}  # path -> SysfsFile, see get_file()
+
+
+def get_file(path):
+    """The SysfsFile of path, opened at its first read and then kept open."""
+    sysfs_file = _files.get(path)
+    if sysfs_file is None:
+        sysfs_file = _files.setdefault(path, SysfsFile(path))
+    return sysfs_file
+
+
+def read_text(path):
+    return get_file(path).read_text()
+
+
+def read_int(path):
+    return get_file(path).read_int()